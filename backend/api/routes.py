@@ -1,26 +1,48 @@
 """
 API routes for the OCR backend.
+Inference modules (torch/transformers, requests) are imported on first use so that upload, image,
+boxes and cleanup endpoints come up without paying for them.
 """
+import asyncio
+import importlib
 import json
-import time
-import uuid
+import sys
+import threading
 from pathlib import Path
 from typing import List, Optional
 
-from fastapi import Body, File, Form, HTTPException, UploadFile
+from fastapi import Body, File, Form, HTTPException, Request, UploadFile
 from fastapi.responses import FileResponse, StreamingResponse
 
+import config
 from config import TMP_DIR
 from logging_config import log_event
+from models.registry import residency
 from services.archive import extract_archive
-from services.detection import run_detection
+from services.executor import run_io, run_model
 from services.file_upload import save_upload
-from services.ocr import run_manga_ocr, run_paddleocr_vl
-from services.system import get_cpu_name
-from services.translation import translate_text_stream, translate_texts
+from services.result_cache import cache_stats, file_content_hash
+from services.system import get_cpu_name, probe_hardware
+from services.warmup import readiness
 from utils.boxes import boxes_cache_path, save_boxes_cache
-from utils.device import resolve_ocr_device
-from utils.image import crop_box, ensure_image, resolve_image_path, resize_for_model
+from utils.image import load_page, page_cache_stats, resolve_image_path
+
+
+async def _load_module(name: str):
+    """Import a heavy module on first use, off the event loop."""
+    module = sys.modules.get(name)
+    if module is None:
+        module = await run_io(importlib.import_module, name)
+    return module
+
+
+async def _watch_disconnect(request: Request, cancel_event: threading.Event, poll_s: float = 0.5):
+    """Set cancel_event as soon as the client of a streaming response goes away."""
+    while not cancel_event.is_set():
+        if await request.is_disconnected():
+            cancel_event.set()
+            return
+        await asyncio.sleep(poll_s)
 
 
 def register_routes(app, logger):
@@ -30,6 +52,44 @@ def register_routes(app, logger):
     async def system_cpu():
         return {"cpu": get_cpu_name()}
 
+    @app.get("/api/system")
+    async def system_info():
+        profile = config.TUNED_PROFILE
+        return {
+            "hardware": await run_io(probe_hardware),
+            "profile": {
+                "path": str(config.TUNED_PROFILE_PATH),
+                "created_at": profile.get("created_at"),
+                "settings": profile.get("settings", {}),
+            }
+            if profile
+            else None,
+            "settings": {
+                name: getattr(config, name)
+                for name in (
+                    "TORCH_THREADS",
+                    "TORCH_INTEROP_THREADS",
+                    "DETECT_BATCH_SIZE",
+                    "MANGA_OCR_BATCH_SIZE",
+                    "PADDLE_OCR_BATCH_SIZE",
+                    "OCR_WORKERS",
+                    "OCR_WORKER_THREADS",
+                )
+            },
+        }
+
+    @app.get("/api/cache/stats")
+    async def result_cache_stats():
+        return {"results": cache_stats(), "pages": page_cache_stats()}
+
+    @app.get("/api/models")
+    async def model_residency():
+        return residency()
+
+    @app.get("/api/ready")
+    async def ready():
+        return readiness()
+
     @app.get("/api/cleanup/tmp")
     async def cleanup_tmp():
         removed = []
@@ -53,14 +113,14 @@ def register_routes(app, logger):
         )
         saved = []
         for f in files:
-            path = save_upload(f, logger)
+            path = await run_io(save_upload, f, logger)
             suffix = path.suffix.lower()
             
             # Check if it's an archive
             if suffix in {".zip", ".7z", ".rar"}:
                 log_event("[upload] archive_detected", logger, name=f.filename, suffix=suffix)
                 try:
-                    extracted = extract_archive(path, logger)
+                    extracted = await run_io(extract_archive, path, logger)
                     if not extracted:
                         log_event("[upload] archive_empty", logger, name=f.filename, suffix=suffix)
                         # Archive was extracted but contained no image files
@@ -145,12 +205,49 @@ def register_routes(app, logger):
                 detail=f"File not found for id={file_id}. tmp contents={listing}",
             )
         
+        detection = await _load_module("services.detection")
         try:
-            response = run_detection(file_id, image_path, max_boxes, threshold, logger)
+            response = await run_model("detector", detection.run_detection, file_id, image_path, max_boxes, threshold, logger)
             return response
         except RuntimeError as exc:
             raise HTTPException(status_code=500, detail=str(exc)) from exc
 
+    @app.post("/api/detect/batch")
+    async def detect_batch(
+        file_ids: str = Form(...),  # JSON string list of file ids
+        max_boxes: int = Form(10),
+        threshold: float = Form(0.66),
+        batch_size: Optional[int] = Form(None),
+    ):
+        """Batched detection: several pages per RT-DETR forward pass."""
+        try:
+            id_list = json.loads(file_ids)
+        except json.JSONDecodeError:
+            raise HTTPException(status_code=400, detail="Invalid file_ids payload")
+        if not isinstance(id_list, list) or not id_list:
+            raise HTTPException(status_code=400, detail="file_ids must be a non-empty JSON list")
+
+        pages = []
+        missing = []
+        for file_id in id_list:
+            image_path = resolve_image_path(str(file_id))
+            if not image_path.exists():
+                missing.append(file_id)
+                continue
+            pages.append((str(file_id), image_path))
+        if missing:
+            log_event("[detect-batch] missing_files", logger, file_ids=missing)
+
+        detection = await _load_module("services.detection")
+        try:
+            results = await run_model(
+                "detector", detection.run_detection_many, pages, max_boxes, threshold, logger, batch_size=batch_size
+            )
+        except RuntimeError as exc:
+            raise HTTPException(status_code=500, detail=str(exc)) from exc
+        results.extend({"file_id": fid, "boxes": [], "meta": None, "error": "not_found"} for fid in missing)
+        return {"results": results}
+
     @app.get("/api/boxes")
     async def get_cached_boxes(file_id: str):
         path = boxes_cache_path(file_id)
@@ -195,8 +292,7 @@ def register_routes(app, logger):
         if not image_path.exists():
             raise HTTPException(status_code=404, detail="File not found")
 
-        img = ensure_image(image_path, logger)
-        resized, meta = resize_for_model(img)
+        resized, meta = await run_io(load_page, image_path, logger)
 
         try:
             box_list = json.loads(boxes)
@@ -213,56 +309,15 @@ def register_routes(app, logger):
             routing_map = {}
         log_event("[ocr] routing", logger, routing=routing_map)
 
-        device = resolve_ocr_device()
-        default_model = "manga-ocr" if (lang or "").lower() == "ja" else "paddleocr-vl"
+        ocr_pipeline = await _load_module("services.ocr_pipeline")
+        unknown = {routing_map.get(b.get("type")) for b in box_list} - {None, "", *ocr_pipeline.OCR_MODELS}
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown OCR model: {sorted(unknown)[0]}")
 
+        page_hash = await run_io(file_content_hash, image_path)
         results = {}
-        total_boxes = len(box_list)
-        processed = 0
-        started = time.perf_counter()
-        for b in box_list:
-            box_id = b.get("id") or uuid.uuid4().hex
-            box_type = b.get("type")
-            model_id = routing_map.get(box_type)
-            if not model_id:
-                model_id = "paddleocr-vl" if box_type == "sounds" else default_model
-            crop, crop_coords = crop_box(resized, b)
-            if crop is None:
-                log_event("[ocr] invalid_box", logger, box_id=box_id, box=b)
-                results[box_id] = ""
-                continue
-            try:
-                box_start = time.perf_counter()
-                if model_id == "manga-ocr":
-                    text = run_manga_ocr(crop, device, logger)
-                elif model_id == "paddleocr-vl":
-                    text = run_paddleocr_vl(crop, device, lang, logger)
-                else:
-                    raise HTTPException(status_code=400, detail=f"Unknown OCR model: {model_id}")
-                results[box_id] = text
-                processed += 1
-                elapsed = time.perf_counter() - started
-                box_ms = int((time.perf_counter() - box_start) * 1000)
-                avg_ms = (elapsed / processed) * 1000 if processed else 0
-                remaining = max(0, total_boxes - processed)
-                eta_ms = int((avg_ms * remaining)) if processed else 0
-                log_event(
-                    "[ocr] box_done",
-                    logger,
-                    box_id=box_id,
-                    model=model_id,
-                    crop=crop_coords,
-                    chars=len(text),
-                    crop_size=(crop.width, crop.height),
-                    duration_ms=box_ms,
-                    progress=f"{processed}/{total_boxes}",
-                    eta_ms=eta_ms,
-                )
-            except HTTPException:
-                raise
-            except Exception as exc:
-                logger.exception("[ocr] box_failed", extra={"box_id": box_id, "model": model_id})
-                results[box_id] = ""
+        async for result in ocr_pipeline.iter_ocr_results(box_list, resized, page_hash, routing_map, lang, "[ocr]", logger):
+            results[result["box_id"]] = result["text"]
 
         response = {"results": results, "meta": meta, "lang": lang, "one_page_mode": one_page_mode}
         log_event("[ocr] response", logger, file_id=file_id, results=len(results))
@@ -288,8 +343,9 @@ def register_routes(app, logger):
         if not isinstance(text_list, list):
             raise HTTPException(status_code=400, detail="texts must be a JSON list")
         
+        translation = await _load_module("services.translation")
         try:
-            results = translate_texts(text_list, source_lang, target_lang, api_key, model, logger)
+            results = await run_io(translation.translate_texts, text_list, source_lang, target_lang, api_key, model, logger)
         except HTTPException:
             raise
         
@@ -299,6 +355,7 @@ def register_routes(app, logger):
 
     @app.post("/api/ocr/stream")
     async def ocr_stream(
+        request: Request,
         file_id: str = Form(...),
         boxes: str = Form(...),
         lang: Optional[str] = Form("ja"),
@@ -322,58 +379,110 @@ def register_routes(app, logger):
             routing_map = {}
         
         async def generate():
-            img = ensure_image(image_path, logger)
-            resized, meta = resize_for_model(img)
-            device = resolve_ocr_device()
-            default_model = "manga-ocr" if (lang or "").lower() == "ja" else "paddleocr-vl"
-            total_boxes = len(box_list)
-            processed = 0
-            started = time.perf_counter()
-            
-            for b in box_list:
-                box_id = b.get("id") or uuid.uuid4().hex
-                box_type = b.get("type")
-                model_id = routing_map.get(box_type)
-                if not model_id:
-                    model_id = "paddleocr-vl" if box_type == "sounds" else default_model
-                crop, crop_coords = crop_box(resized, b)
-                
-                if crop is None:
-                    result = {"box_id": box_id, "text": "", "status": "error", "error": "invalid_box"}
-                else:
-                    try:
-                        box_start = time.perf_counter()
-                        if model_id == "manga-ocr":
-                            text = run_manga_ocr(crop, device, logger)
-                        elif model_id == "paddleocr-vl":
-                            text = run_paddleocr_vl(crop, device, lang, logger)
-                        else:
-                            text = ""
-                        result = {"box_id": box_id, "text": text, "status": "done"}
-                        processed += 1
-                        elapsed = time.perf_counter() - started
-                        box_ms = int((time.perf_counter() - box_start) * 1000)
-                        avg_ms = (elapsed / processed) * 1000 if processed else 0
-                        remaining = max(0, total_boxes - processed)
-                        eta_ms = int((avg_ms * remaining)) if processed else 0
-                        log_event(
-                            "[ocr-stream] box_done",
-                            logger,
-                            box_id=box_id,
-                            chars=len(text),
-                            crop=crop_coords,
-                            crop_size=(crop.width, crop.height),
-                            duration_ms=box_ms,
-                            progress=f"{processed}/{total_boxes}",
-                            eta_ms=eta_ms,
-                        )
-                    except Exception as exc:
-                        logger.exception("[ocr-stream] box_failed", extra={"box_id": box_id})
-                        result = {"box_id": box_id, "text": "", "status": "error", "error": str(exc)}
-                
-                yield f"data: {json.dumps(result)}\n\n"
-            
-            yield f"data: {json.dumps({'status': 'complete', 'total': len(box_list)})}\n\n"
+            cancel_event = threading.Event()
+            watcher = asyncio.ensure_future(_watch_disconnect(request, cancel_event))
+            sent = 0
+            completed = False
+            try:
+                ocr_pipeline = await _load_module("services.ocr_pipeline")
+                resized, meta = await run_io(load_page, image_path, logger)
+                page_hash = await run_io(file_content_hash, image_path)
+                async for result in ocr_pipeline.iter_ocr_results(
+                    box_list,
+                    resized,
+                    page_hash,
+                    routing_map,
+                    lang,
+                    "[ocr-stream]",
+                    logger,
+                    stream_tokens=True,
+                    cancel_event=cancel_event,
+                ):
+                    if cancel_event.is_set():
+                        break
+                    if result.get("status") != "partial":
+                        sent += 1
+                    yield f"data: {json.dumps(result)}\n\n"
+                if not cancel_event.is_set():
+                    yield f"data: {json.dumps({'status': 'complete', 'total': len(box_list)})}\n\n"
+                    completed = True
+            finally:
+                watcher.cancel()
+                if not completed:
+                    cancel_event.set()
+                    log_event(
+                        "[ocr-stream] client_disconnected", logger, file_id=file_id, sent=sent, total=len(box_list)
+                    )
+        
+        return StreamingResponse(
+            generate(),
+            media_type="text/event-stream",
+            headers={
+                "Cache-Control": "no-cache",
+                "Connection": "keep-alive",
+                "X-Accel-Buffering": "no",
+            }
+        )
+
+    @app.post("/api/ocr/volume")
+    async def ocr_volume(
+        request: Request,
+        pages: str = Form(...),  # JSON array of {"file_id": ..., "boxes": [...]}
+        lang: Optional[str] = Form("ja"),
+        routing: Optional[str] = Form(None),
+    ):
+        """Streaming OCR over many pages at once; batches span pages and results carry file_id."""
+        try:
+            page_list = json.loads(pages)
+        except json.JSONDecodeError:
+            raise HTTPException(status_code=400, detail="Invalid pages payload")
+        if not isinstance(page_list, list) or not all(
+            isinstance(p, dict) and isinstance(p.get("file_id"), str) and isinstance(p.get("boxes"), list)
+            for p in page_list
+        ):
+            raise HTTPException(status_code=400, detail="pages must be a JSON list of {file_id, boxes}")
+        missing = [p["file_id"] for p in page_list if not resolve_image_path(p["file_id"]).exists()]
+        if missing:
+            raise HTTPException(status_code=404, detail=f"File not found: {', '.join(missing)}")
+        
+        try:
+            routing_map = json.loads(routing) if routing else {}
+        except json.JSONDecodeError:
+            routing_map = {}
+        
+        page_list = [{"file_id": p["file_id"], "boxes": p["boxes"]} for p in page_list if p["boxes"]]
+        total = sum(len(p["boxes"]) for p in page_list)
+        log_event("[ocr-volume] request", logger, pages=len(page_list), boxes=total, lang=lang)
+        
+        async def generate():
+            cancel_event = threading.Event()
+            watcher = asyncio.ensure_future(_watch_disconnect(request, cancel_event))
+            sent = 0
+            completed = False
+            try:
+                ocr_pipeline = await _load_module("services.ocr_pipeline")
+                async for result in ocr_pipeline.iter_volume_ocr_results(
+                    page_list,
+                    routing_map,
+                    lang,
+                    "[ocr-volume]",
+                    logger,
+                    stream_tokens=True,
+                    cancel_event=cancel_event,
+                ):
+                    if cancel_event.is_set():
+                        break
+                    if result.get("status") != "partial":
+                        sent += 1
+                    yield f"data: {json.dumps(result)}\n\n"
+                if not cancel_event.is_set():
+                    yield f"data: {json.dumps({'status': 'complete', 'total': total, 'pages': len(page_list)})}\n\n"
+                    completed = True
+            finally:
+                watcher.cancel()
+                if not completed:
+                    cancel_event.set()
+                    log_event("[ocr-volume] client_disconnected", logger, sent=sent, total=total)
         
         return StreamingResponse(
             generate(),
@@ -387,6 +496,7 @@ def register_routes(app, logger):
 
     @app.post("/api/translate/stream")
     async def translate_stream(
+        request: Request,
         texts: str = Form(...),
         box_ids: str = Form(...),  # JSON array of box IDs corresponding to texts
         source_lang: Optional[str] = Form("ja"),
@@ -407,13 +517,21 @@ def register_routes(app, logger):
             raise HTTPException(status_code=400, detail="texts and box_ids must have same length")
         
         async def generate():
+            translation = await _load_module("services.translation")
             for idx, (text, box_id) in enumerate(zip(text_list, box_id_list)):
+                if await request.is_disconnected():
+                    log_event(
+                        "[translate-stream] client_disconnected", logger, sent=idx, total=len(text_list)
+                    )
+                    return
                 if not text or not isinstance(text, str) or not text.strip():
                     yield f"data: {json.dumps({'box_id': box_id, 'text': '', 'status': 'done'})}\n\n"
                     continue
                 
                 try:
-                    translated_text = translate_text_stream(text, source_lang, target_lang, api_key, model, logger)
+                    translated_text = await run_io(
+                        translation.translate_text_stream, text, source_lang, target_lang, api_key, model, logger
+                    )
                     result = {"box_id": box_id, "text": translated_text, "status": "done", "index": idx}
                     log_event("[translate-stream] done", logger, box_id=box_id, chars=len(translated_text))
                 except Exception as exc:
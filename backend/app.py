@@ -4,6 +4,8 @@ Backend scaffold for OCR web-app.
 - Stores temporary files under tmp/.
 - Detection via RT-DETR; OCR via manga-ocr (comic-translate) or PaddleOCR-VL-For-Manga.
 """
+import asyncio
+import contextlib
 import os
 
 from fastapi import FastAPI
@@ -11,12 +13,30 @@ from fastapi.middleware.cors import CORSMiddleware
 
 from api.routes import register_routes
 from logging_config import setup_logger
+from services.executor import shutdown_executors
+from services.ocr_workers import shutdown_ocr_pool
+from services.warmup import preload_models
 
 # Setup logger
 log = setup_logger()
 
+
+@contextlib.asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Start the background model preload; on shutdown cancel it before stopping the executors."""
+    app.state.preload_task = asyncio.create_task(preload_models(log))
+    try:
+        yield
+    finally:
+        app.state.preload_task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await app.state.preload_task
+        shutdown_executors()
+        shutdown_ocr_pool()
+
+
 # Create FastAPI app
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 # Add CORS middleware
 app.add_middleware(
@@ -30,6 +50,7 @@ app.add_middleware(
 # Register all routes
 register_routes(app, log)
 
+
 if __name__ == "__main__":
     import uvicorn
 
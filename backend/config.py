@@ -1,6 +1,8 @@
 """
 Configuration constants and paths.
 """
+import json
+import os
 import sys
 from pathlib import Path
 
@@ -15,6 +17,33 @@ PADDLE_OCR_VL_DIR = THIRD_PARTY_DIR / "paddleocr-vl-for-manga"
 LOG_DIR = ROOT_DIR / "logs"
 LOG_DIR.mkdir(exist_ok=True)
 LOG_FILE = LOG_DIR / "backend.log"
+CACHE_DIR = ROOT_DIR / "cache"
+CACHE_DIR.mkdir(exist_ok=True)
+RESULT_CACHE_DIR = CACHE_DIR / "results"
+
+# Tuned CPU profile written by devtools/scripts/autotune.py; its settings become the defaults below
+# (explicit environment variables still win).
+TUNED_PROFILE_PATH = Path(os.getenv("TUNED_PROFILE_PATH", str(CACHE_DIR / "tuned_profile.json")))
+
+
+def _load_json_dict(path: Path) -> dict:
+    try:
+        data = json.loads(path.read_text())
+    except (OSError, ValueError):
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+TUNED_PROFILE = _load_json_dict(TUNED_PROFILE_PATH)
+
+
+def _setting(name: str, default) -> str:
+    """Environment variable, else tuned profile value, else default."""
+    value = os.getenv(name)
+    if value is not None:
+        return value
+    return str(TUNED_PROFILE.get("settings", {}).get(name, default))
+
 
 # Add comic-translate to Python path
 if str(COMIC_TRANSLATE_DIR) not in sys.path:
@@ -45,6 +74,64 @@ try:
 except ImportError:
     HAS_RAR = False
 
+# Decoded-page LRU cache shared by detection and OCR (resized RGB pages)
+PAGE_CACHE_MAX_MB = float(os.getenv("PAGE_CACHE_MAX_MB", "256"))
+
 # OCR settings
 OCR_CROP_PAD_RATIO = 0.05
+# Crop dedup within a request: 0 (default) OCRs pixel-identical crops once, a positive value also
+# merges crops within that dHash Hamming distance (bubble outlines dominate the hash, so different
+# text in same-size bubbles can match), negative disables
+OCR_DEDUP_MAX_DISTANCE = int(os.getenv("OCR_DEDUP_MAX_DISTANCE", "0"))
+MANGA_OCR_BATCH_SIZE = max(1, int(_setting("MANGA_OCR_BATCH_SIZE", "8")))
+# manga-ocr engine: "torch" (float32, default) or "int8" (dynamic int8 Linear layers, CPU only)
+MANGA_OCR_ENGINE = os.getenv("MANGA_OCR_ENGINE", "torch").strip().lower()
+# Pages a volume OCR job decodes ahead of the page currently being batched
+OCR_VOLUME_PREFETCH_PAGES = max(1, int(os.getenv("OCR_VOLUME_PREFETCH_PAGES", "2")))
+# OCR pipeline depth: boxes cropped/hashed ahead on the I/O pool, and batches preprocessed while
+# another batch generates on the model worker
+OCR_PREFETCH_BOXES = max(1, int(os.getenv("OCR_PREFETCH_BOXES", "16")))
+OCR_PREFETCH_BATCHES = max(1, int(os.getenv("OCR_PREFETCH_BATCHES", "1")))
+# PaddleOCR-VL batched generation (1 disables batching); crops are bucketed by vision-token count
+PADDLE_OCR_BATCH_SIZE = max(1, int(_setting("PADDLE_OCR_BATCH_SIZE", "4")))
+# PaddleOCR-VL precision on CPU: "fp32" (default), "bf16" (bf16 weights + autocast, needs native CPU
+# bf16, else fp32) or "int8" (int8 language-model Linear layers)
+PADDLE_OCR_CPU_PRECISION = os.getenv("PADDLE_OCR_CPU_PRECISION", "fp32").strip().lower()
+PADDLE_OCR_BUCKET_TOKEN_RATIO = float(os.getenv("PADDLE_OCR_BUCKET_TOKEN_RATIO", "1.25"))
+PADDLE_OCR_BUCKET_MAX_NEW_TOKENS_DELTA = int(os.getenv("PADDLE_OCR_BUCKET_MAX_NEW_TOKENS_DELTA", "8"))
+# Learned per-crop generation budgets (quantile regression over crop area, aspect ratio and box type),
+# written by devtools/scripts/fit_token_budget.py. Models without an entry keep the built-in rules.
+TOKEN_BUDGET_PATH = Path(os.getenv("TOKEN_BUDGET_PATH", str(Path(__file__).resolve().parent / "token_budget.json")))
+TOKEN_BUDGET = _load_json_dict(TOKEN_BUDGET_PATH).get("models", {})
+
+# Detection settings
+# Detector engine: "torch" (default), "onnx" (ONNX Runtime CPU) or "onnx-int8" (dynamic int8 quantized);
+# the ONNX engines need onnxruntime and export the checkpoint once into DETECTOR_ONNX_DIR
+DETECTOR_ENGINE = os.getenv("DETECTOR_ENGINE", "torch").strip().lower()
+DETECTOR_ONNX_DIR = Path(os.getenv("DETECTOR_ONNX_DIR", str(CACHE_DIR / "onnx")))
+DETECT_BATCH_SIZE = max(1, int(_setting("DETECT_BATCH_SIZE", "8")))
+# IoU threshold for overlap suppression; unset keeps the strict "no intersection" rule.
+_DETECT_NMS_IOU_RAW = os.getenv("DETECT_NMS_IOU", "").strip()
+DETECT_NMS_IOU = float(_DETECT_NMS_IOU_RAW) if _DETECT_NMS_IOU_RAW else None
+
+# Content-addressed result cache (survives tmp cleanup and re-uploads)
+RESULT_CACHE_MAX_MB = float(os.getenv("RESULT_CACHE_MAX_MB", "512"))
+
+# Model residency: loaded models' parameter/buffer bytes above this budget evict the least recently used model
+# (0 = no limit). Weight bytes only, not process RSS. MODEL_MEMORY_BUDGET_MB is still read as a fallback.
+MODEL_WEIGHT_BUDGET_MB = float(os.getenv("MODEL_WEIGHT_BUDGET_MB", os.getenv("MODEL_MEMORY_BUDGET_MB", "0")))
+
+# Startup preload: comma-separated models to load and warm up in the background ("" = load on first request)
+PRELOAD_MODELS = [m.strip() for m in os.getenv("PRELOAD_MODELS", "").split(",") if m.strip()]
+
+# CPU OCR worker processes (0 = OCR in-process on one model worker thread)
+OCR_WORKERS = max(0, int(_setting("OCR_WORKERS", "0")))
+OCR_WORKER_THREADS = max(1, int(_setting("OCR_WORKER_THREADS", "4")))
+OCR_WORKER_AFFINITY = os.getenv("OCR_WORKER_AFFINITY", "0").lower() in {"1", "true", "yes"}
+
+# torch intra-op / inter-op threads for in-process inference (0 = torch default)
+TORCH_THREADS = max(0, int(_setting("TORCH_THREADS", "0")))
+TORCH_INTEROP_THREADS = max(0, int(_setting("TORCH_INTEROP_THREADS", "0")))
 
+# Executors: bounded pool for I/O and decoding (models get one worker thread each)
+IO_WORKERS = max(1, int(os.getenv("IO_WORKERS", str(min(8, (os.cpu_count() or 2) + 2)))))
@@ -1,24 +1,37 @@
 """
 Detector model loading and management.
 """
+import hashlib
+
 import torch
-from transformers import AutoImageProcessor, AutoModelForObjectDetection
+from transformers import AutoConfig, AutoImageProcessor, AutoModelForObjectDetection
 
-from config import DETECTOR_DIR
-from utils.device import resolve_ocr_device
+from config import DETECTOR_DIR, DETECTOR_ENGINE
+from models import registry
+from utils.device import configure_torch_threads, resolve_ocr_device
 from logging_config import log_event
 
 # Global cache for detector model
 _det_model = None
 _det_processor = None
 
+DETECTOR_ENGINES = ("torch", "onnx", "onnx-int8")
+
+
+def _load_torch_detector():
+    return AutoModelForObjectDetection.from_pretrained(DETECTOR_DIR, torch_dtype=torch.float32)
+
 
+@registry.tracks_loading("detector")
 def load_detector(logger):
     """Load detector model with caching."""
     global _det_model, _det_processor
     if _det_model is not None and _det_processor is not None:
-        log_event("[detect] model_cache_hit", logger, device=str(next(_det_model.parameters()).device))
+        log_event("[detect] model_cache_hit", logger, device=str(_det_model.device))
+        registry.touch("detector")
         return _det_model, _det_processor
+    if DETECTOR_ENGINE not in DETECTOR_ENGINES:
+        raise RuntimeError(f"Unknown DETECTOR_ENGINE {DETECTOR_ENGINE!r} (expected one of {', '.join(DETECTOR_ENGINES)})")
     if not DETECTOR_DIR.exists():
         raise RuntimeError("Detector directory not found")
     weight_files = list(DETECTOR_DIR.glob("*.safetensors")) or list(DETECTOR_DIR.glob("*.bin"))
@@ -34,20 +47,65 @@ def load_detector(logger):
             f"Weight file too small ({size_bytes} bytes): {weight_path}. "
             "Looks like a git-lfs pointer. Run `git lfs install && git lfs pull` in the repo to fetch real weights."
         )
-    log_event("[detect] loading_model", logger, detector_dir=str(DETECTOR_DIR))
+    configure_torch_threads(logger)
+    log_event("[detect] loading_model", logger, detector_dir=str(DETECTOR_DIR), engine=DETECTOR_ENGINE)
     _det_processor = AutoImageProcessor.from_pretrained(DETECTOR_DIR)
-    _det_model = AutoModelForObjectDetection.from_pretrained(
-        DETECTOR_DIR, torch_dtype=torch.float32
-    )
-    device = resolve_ocr_device()
-    _det_model.to(device)
-    _det_model.eval()
+    if DETECTOR_ENGINE == "torch":
+        _det_model = _load_torch_detector()
+        device = resolve_ocr_device()
+        _det_model.to(device)
+        _det_model.eval()
+        footprint = registry.module_footprint_bytes(_det_model)
+        dtype = str(next(_det_model.parameters()).dtype)
+    else:
+        from models.detector_onnx import load_onnx_detector
+
+        _det_model = load_onnx_detector(
+            _load_torch_detector,
+            _det_processor,
+            AutoConfig.from_pretrained(DETECTOR_DIR),
+            _weights_fingerprint(),
+            logger,
+            quantized=DETECTOR_ENGINE == "onnx-int8",
+        )
+        footprint = _det_model.footprint_bytes()
+        dtype = "int8" if _det_model.quantized else "float32"
     log_event(
         "[detect] model_ready",
         logger,
-        device=str(device),
+        engine=DETECTOR_ENGINE,
+        device=str(_det_model.device),
         labels=getattr(_det_model.config, "id2label", {}),
-        dtype=str(next(_det_model.parameters()).dtype),
+        dtype=dtype,
     )
-    return _det_model, _det_processor
+    model, processor = _det_model, _det_processor
+    registry.register_loaded("detector", footprint, unload_detector, logger)
+    return model, processor
+
+
+def unload_detector():
+    """Drop the cached detector so its weights can be freed."""
+    global _det_model, _det_processor
+    _det_model = None
+    _det_processor = None
+
+
+def _weights_fingerprint() -> str:
+    """Identify the detector weights on disk (name, size, mtime) without loading them."""
+    weight_files = sorted(DETECTOR_DIR.glob("*.safetensors")) or sorted(DETECTOR_DIR.glob("*.bin"))
+    parts = []
+    for path in weight_files:
+        try:
+            stat = path.stat()
+        except OSError:
+            continue
+        parts.append(f"{path.name}:{stat.st_size}:{stat.st_mtime_ns}")
+    return hashlib.sha1("|".join(parts).encode("utf-8")).hexdigest()[:16]
+
 
+def detector_fingerprint() -> str:
+    """Identify the detector (weights on disk plus a non-default engine) for result caching."""
+    fingerprint = _weights_fingerprint()
+    if DETECTOR_ENGINE == "torch":
+        return fingerprint
+    return hashlib.sha1(f"{fingerprint}|{DETECTOR_ENGINE}".encode("utf-8")).hexdigest()[:16]
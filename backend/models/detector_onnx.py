@@ -0,0 +1,144 @@
+"""
+ONNX Runtime detector engine (DETECTOR_ENGINE=onnx or onnx-int8).
+The RT-DETR checkpoint in DETECTOR_DIR is exported to ONNX once, optionally quantized to dynamic
+int8, and cached under DETECTOR_ONNX_DIR keyed by the weights fingerprint. OnnxDetector stands in
+for the PyTorch model: called with pixel_values it returns the same logits/pred_boxes output.
+"""
+import importlib
+import os
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Optional
+
+import torch
+from transformers.utils import ModelOutput
+
+from config import DETECTOR_ONNX_DIR, TORCH_THREADS
+from logging_config import log_event
+
+ONNX_OPSET = 17
+
+
+@dataclass
+class DetectorOutput(ModelOutput):
+    logits: Optional[torch.FloatTensor] = None
+    pred_boxes: Optional[torch.FloatTensor] = None
+
+
+class _DetectorHead(torch.nn.Module):
+    """Export wrapper: pixel_values -> (logits, pred_boxes), nothing else."""
+
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+
+    def forward(self, pixel_values):
+        outputs = self.model(pixel_values=pixel_values)
+        return outputs.logits, outputs.pred_boxes
+
+
+class OnnxDetector:
+    """ONNX Runtime session with the call signature and attributes the detection service uses."""
+
+    def __init__(self, session, path: Path, config, quantized: bool):
+        self.session = session
+        self.path = path
+        self.config = config
+        self.quantized = quantized
+        self.device = torch.device("cpu")
+
+    def __call__(self, pixel_values, **_unused):
+        logits, pred_boxes = self.session.run(
+            ["logits", "pred_boxes"], {"pixel_values": pixel_values.cpu().numpy()}
+        )
+        return DetectorOutput(logits=torch.from_numpy(logits), pred_boxes=torch.from_numpy(pred_boxes))
+
+    def eval(self):
+        return self
+
+    def footprint_bytes(self) -> int:
+        return self.path.stat().st_size
+
+
+def _import_onnxruntime():
+    try:
+        return importlib.import_module("onnxruntime")
+    except ImportError as exc:
+        raise RuntimeError("DETECTOR_ENGINE=onnx requires onnxruntime (pip install onnxruntime)") from exc
+
+
+def onnx_model_path(fingerprint: str, quantized: bool) -> Path:
+    return DETECTOR_ONNX_DIR / f"detector-{fingerprint}{'.int8' if quantized else ''}.onnx"
+
+
+def _input_size(processor):
+    size = getattr(processor, "size", None) or {}
+    height = size.get("height") or size.get("shortest_edge") or 640
+    width = size.get("width") or size.get("shortest_edge") or 640
+    return int(height), int(width)
+
+
+def export_detector_onnx(load_torch_model: Callable, processor, fingerprint: str, logger, quantized: bool = False) -> Path:
+    """Export (and quantize) the detector once; later calls return the cached file."""
+    path = onnx_model_path(fingerprint, quantized)
+    if path.exists():
+        return path
+    DETECTOR_ONNX_DIR.mkdir(parents=True, exist_ok=True)
+    fp32_path = onnx_model_path(fingerprint, False)
+    if not fp32_path.exists():
+        start = time.perf_counter()
+        model = load_torch_model().to("cpu").eval()
+        height, width = _input_size(processor)
+        tmp_path = fp32_path.with_suffix(f".{os.getpid()}.tmp")
+        with torch.no_grad():
+            torch.onnx.export(
+                _DetectorHead(model),
+                (torch.zeros(1, 3, height, width),),
+                str(tmp_path),
+                input_names=["pixel_values"],
+                output_names=["logits", "pred_boxes"],
+                dynamic_axes={"pixel_values": {0: "batch"}, "logits": {0: "batch"}, "pred_boxes": {0: "batch"}},
+                opset_version=ONNX_OPSET,
+                dynamo=False,
+            )
+        tmp_path.replace(fp32_path)
+        log_event(
+            "[detect] onnx_exported",
+            logger,
+            path=str(fp32_path),
+            input_size=(height, width),
+            duration_ms=int((time.perf_counter() - start) * 1000),
+        )
+    if quantized:
+        _import_onnxruntime()
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        start = time.perf_counter()
+        tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+        # Transformer matmuls only: ConvInteger is slow on the CPU provider and costs the backbone accuracy.
+        quantize_dynamic(
+            str(fp32_path), str(tmp_path), op_types_to_quantize=["MatMul", "Gemm"], weight_type=QuantType.QInt8
+        )
+        tmp_path.replace(path)
+        log_event(
+            "[detect] onnx_quantized",
+            logger,
+            path=str(path),
+            fp32_bytes=fp32_path.stat().st_size,
+            int8_bytes=path.stat().st_size,
+            duration_ms=int((time.perf_counter() - start) * 1000),
+        )
+    return path
+
+
+def load_onnx_detector(load_torch_model: Callable, processor, config, fingerprint: str, logger, quantized: bool = False):
+    """Export if needed and open an ONNX Runtime CPU session for the detector."""
+    ort = _import_onnxruntime()
+    path = export_detector_onnx(load_torch_model, processor, fingerprint, logger, quantized)
+    options = ort.SessionOptions()
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    if TORCH_THREADS:
+        options.intra_op_num_threads = TORCH_THREADS
+    session = ort.InferenceSession(str(path), sess_options=options, providers=["CPUExecutionProvider"])
+    return OnnxDetector(session, path, config, quantized)
@@ -3,21 +3,52 @@ Manga OCR model loading and management.
 """
 import sys
 import importlib.util
+import time
 import torch
 
-from config import COMIC_TRANSLATE_DIR
+from config import COMIC_TRANSLATE_DIR, MANGA_OCR_ENGINE
 from logging_config import log_event
+from models import registry
+from utils.device import configure_torch_threads
 
 # Global cache for manga OCR model
 _manga_ocr_model = None
 _manga_ocr_device = None
 
+MANGA_OCR_ENGINES = ("torch", "int8")
 
+
+def manga_ocr_engine(device) -> str:
+    """Engine actually used on device: int8 dynamic quantization only runs on CPU."""
+    if MANGA_OCR_ENGINE == "int8" and getattr(device, "type", str(device)) != "cpu":
+        return "torch"
+    return MANGA_OCR_ENGINE
+
+
+def quantize_manga_ocr(model, logger):
+    """Dynamic int8 quantization of the encoder and decoder Linear layers, in place (CPU only)."""
+    start = time.perf_counter()
+    fp32_bytes = registry.module_footprint_bytes(model.model)
+    torch.ao.quantization.quantize_dynamic(model.model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+    log_event(
+        "[ocr] manga_ocr_quantized",
+        logger,
+        fp32_bytes=fp32_bytes,
+        int8_bytes=registry.module_footprint_bytes(model.model),
+        duration_ms=int((time.perf_counter() - start) * 1000),
+    )
+    return model
+
+
+@registry.tracks_loading("manga-ocr")
 def load_manga_ocr(device: torch.device, logger):
     """Load manga OCR model with caching."""
     global _manga_ocr_model, _manga_ocr_device
     if _manga_ocr_model is not None and _manga_ocr_device == device:
+        registry.touch("manga-ocr")
         return _manga_ocr_model
+    if MANGA_OCR_ENGINE not in MANGA_OCR_ENGINES:
+        raise RuntimeError(f"Unknown MANGA_OCR_ENGINE {MANGA_OCR_ENGINE!r} (expected one of {', '.join(MANGA_OCR_ENGINES)})")
     if not COMIC_TRANSLATE_DIR.exists():
         raise RuntimeError("comic-translate directory not found")
     try:
@@ -45,10 +76,38 @@ def load_manga_ocr(device: torch.device, logger):
     model_dir = COMIC_TRANSLATE_DIR / "models" / "ocr" / "manga-ocr-base"
     if not model_dir.exists():
         raise RuntimeError(f"Manga OCR weights not found at {model_dir}")
+    configure_torch_threads(logger)
     log_event("[ocr] loading_manga_ocr", logger, model_dir=str(model_dir), device=str(device))
     model = MangaOcr(pretrained_model_name_or_path=str(model_dir), device=str(device))
     model.model.eval()
+    engine = manga_ocr_engine(device)
+    if engine != MANGA_OCR_ENGINE:
+        log_event("[ocr] manga_ocr_engine_fallback", logger, engine=MANGA_OCR_ENGINE, device=str(device), using=engine)
+    if engine == "int8":
+        quantize_manga_ocr(model, logger)
     _manga_ocr_model = model
     _manga_ocr_device = device
-    log_event("[ocr] manga_ocr_ready", logger, device=str(device))
-    return _manga_ocr_model
+    log_event("[ocr] manga_ocr_ready", logger, device=str(device), engine=engine)
+    registry.register_loaded("manga-ocr", registry.module_footprint_bytes(model.model), unload_manga_ocr, logger)
+    return model
+
+
+def unload_manga_ocr():
+    """Drop the cached manga-ocr engine so its weights can be freed."""
+    global _manga_ocr_model, _manga_ocr_device
+    _manga_ocr_model = None
+    _manga_ocr_device = None
+
+
+def get_loaded_manga_ocr(device: torch.device):
+    """Return the cached manga-ocr engine for device, if loaded (for services that only need its processor)."""
+    if _manga_ocr_model is not None and _manga_ocr_device == device:
+        return _manga_ocr_model
+    return None
+
+
+def get_manga_ocr_post_process(model):
+    """Return comic-translate's manga-ocr post_process for the loaded engine (identity if missing)."""
+    module = sys.modules.get(type(model).__module__)
+    post_process = getattr(module, "post_process", None)
+    return post_process if callable(post_process) else (lambda text: text)
@@ -2,25 +2,69 @@
 PaddleOCR-VL model loading and management.
 """
 import inspect
-from typing import Optional
+import time
+from typing import Dict, Optional
 
 import torch
 from transformers import AutoModelForCausalLM, AutoProcessor
 
-from config import PADDLE_OCR_VL_DIR
+from config import PADDLE_OCR_CPU_PRECISION, PADDLE_OCR_VL_DIR
 from logging_config import log_event
-from utils.device import paddleocr_default_dtype, resolve_paddle_device
+from models import registry
+from utils.device import configure_torch_threads, paddleocr_default_dtype, resolve_paddle_device
+
+PADDLE_OCR_CPU_PRECISIONS = ("fp32", "bf16", "int8")
+# Vision encoder and projector stay in float: int8 there costs accuracy for little memory.
+_NON_LM_MODULES = ("visual", "vision", "mlp_AR", "projector")
 
 # Global cache for PaddleOCR-VL model
 _paddle_ocr_model = None
 _paddle_ocr_processor = None
 _paddle_ocr_device = None
 _paddle_ocr_dtype = None
+# dtype requested at load time: the cache is keyed on it, since a bf16 load can fall back to fp32.
+_paddle_ocr_requested_dtype = None
+_paddle_ocr_precision = None
+# Rendered prompt and tokenized prompt pieces per (processor, lang); cleared on unload.
+_prompt_cache: Dict[tuple, str] = {}
+_prompt_ids_cache: Dict[tuple, Optional[tuple]] = {}
+# (processor id, lang, batched) -> whether inputs built from the memoized prompt ids matched the
+# processor's own output; filled by services.ocr, cleared with the caches above.
+prompt_inputs_verified: Dict[tuple, bool] = {}
+
+
+def quantize_paddleocr_vl(model, logger):
+    """Dynamic int8 quantization of the language-model Linear layers (incl. lm_head), in place (CPU only)."""
+    start = time.perf_counter()
+    fp32_bytes = registry.module_footprint_bytes(model)
+    names = {
+        name
+        for name, module in model.named_modules()
+        if isinstance(module, torch.nn.Linear) and not any(part in name for part in _NON_LM_MODULES)
+    }
+    qconfig = torch.ao.quantization.default_dynamic_qconfig
+    torch.ao.quantization.quantize_dynamic(model, {name: qconfig for name in names}, dtype=torch.qint8, inplace=True)
+    log_event(
+        "[ocr] paddleocr_vl_quantized",
+        logger,
+        linear_layers=len(names),
+        fp32_bytes=fp32_bytes,
+        int8_bytes=registry.module_footprint_bytes(model),
+        duration_ms=int((time.perf_counter() - start) * 1000),
+    )
+    return model
 
 
+@registry.tracks_loading("paddleocr-vl")
 def load_paddleocr_vl(device: torch.device, logger):
-    """Load PaddleOCR-VL model with caching."""
-    global _paddle_ocr_model, _paddle_ocr_processor, _paddle_ocr_device, _paddle_ocr_dtype
+    """Load PaddleOCR-VL model with caching (PADDLE_OCR_CPU_PRECISION selects bf16 / int8 on CPU)."""
+    global _paddle_ocr_model, _paddle_ocr_processor, _paddle_ocr_device, _paddle_ocr_dtype, _paddle_ocr_precision
+    global _paddle_ocr_requested_dtype
+    if PADDLE_OCR_CPU_PRECISION not in PADDLE_OCR_CPU_PRECISIONS:
+        raise RuntimeError(
+            f"Unknown PADDLE_OCR_CPU_PRECISION {PADDLE_OCR_CPU_PRECISION!r} "
+            f"(expected one of {', '.join(PADDLE_OCR_CPU_PRECISIONS)})"
+        )
     # Avoid MPS for PaddleOCR-VL; use CUDA on Windows when possible.
     target_device = resolve_paddle_device(device, logger)
     dtype = paddleocr_default_dtype(target_device)
@@ -28,12 +72,16 @@ def load_paddleocr_vl(device: torch.device, logger):
         _paddle_ocr_model is not None
         and _paddle_ocr_processor is not None
         and _paddle_ocr_device == target_device
-        and _paddle_ocr_dtype == dtype
+        and _paddle_ocr_requested_dtype == dtype
     ):
+        registry.touch("paddleocr-vl")
         return _paddle_ocr_model, _paddle_ocr_processor
     if not PADDLE_OCR_VL_DIR.exists():
         raise RuntimeError("paddleocr-vl-for-manga directory not found")
     
+    configure_torch_threads(logger)
+    if target_device.type == "cpu" and PADDLE_OCR_CPU_PRECISION == "bf16" and dtype != torch.bfloat16:
+        log_event("[ocr] paddleocr_vl_precision_fallback", logger, requested="bf16", using="fp32", reason="no_cpu_bf16")
     log_event(
         "[ocr] loading_paddleocr_vl",
         logger,
@@ -42,6 +90,7 @@ def load_paddleocr_vl(device: torch.device, logger):
         dtype=str(dtype),
     )
     processor = AutoProcessor.from_pretrained(str(PADDLE_OCR_VL_DIR), trust_remote_code=True)
+    requested_dtype = dtype
 
     def _load_with_dtype(target: torch.device, target_dtype: torch.dtype):
         try:
@@ -95,6 +144,13 @@ def load_paddleocr_vl(device: torch.device, logger):
                 error=str(exc),
             )
     model.eval()
+    precision = "fp32" if dtype == torch.float32 else "bf16" if dtype == torch.bfloat16 else "fp16"
+    if target_device.type == "cpu" and PADDLE_OCR_CPU_PRECISION == "int8" and dtype == torch.float32:
+        try:
+            quantize_paddleocr_vl(model, logger)
+            precision = "int8"
+        except Exception as exc:
+            log_event("[ocr] paddleocr_vl_precision_fallback", logger, requested="int8", using="fp32", error=str(exc))
     if hasattr(model, "model") and hasattr(model.model, "forward"):
         original_forward = model.model.forward
         base_forward = original_forward
@@ -124,12 +180,70 @@ def load_paddleocr_vl(device: torch.device, logger):
     _paddle_ocr_processor = processor
     _paddle_ocr_device = target_device
     _paddle_ocr_dtype = dtype
-    log_event("[ocr] paddleocr_vl_ready", logger, device=str(target_device), dtype=str(dtype))
-    return _paddle_ocr_model, _paddle_ocr_processor
+    _paddle_ocr_requested_dtype = requested_dtype
+    _paddle_ocr_precision = precision
+    footprint = registry.module_footprint_bytes(model)
+    log_event(
+        "[ocr] paddleocr_vl_ready",
+        logger,
+        device=str(target_device),
+        dtype=str(dtype),
+        precision=precision,
+        footprint_mb=round(footprint / (1024 * 1024), 1),
+    )
+    registry.register_loaded("paddleocr-vl", footprint, unload_paddleocr_vl, logger)
+    return model, processor
+
+
+def unload_paddleocr_vl():
+    """Drop the cached PaddleOCR-VL model and processor so their weights can be freed."""
+    global _paddle_ocr_model, _paddle_ocr_processor, _paddle_ocr_device, _paddle_ocr_dtype, _paddle_ocr_precision
+    global _paddle_ocr_requested_dtype
+    _paddle_ocr_model = None
+    _paddle_ocr_processor = None
+    _paddle_ocr_device = None
+    _paddle_ocr_dtype = None
+    _paddle_ocr_requested_dtype = None
+    _paddle_ocr_precision = None
+    _prompt_cache.clear()
+    _prompt_ids_cache.clear()
+    prompt_inputs_verified.clear()
 
 
 def build_paddle_prompt(processor, lang: Optional[str]) -> str:
-    """Build prompt for PaddleOCR-VL."""
+    """Build prompt for PaddleOCR-VL (rendered once per language)."""
+    cache_key = (id(processor), lang)
+    prompt = _prompt_cache.get(cache_key)
+    if prompt is None:
+        prompt = _render_paddle_prompt(processor, lang)
+        _prompt_cache[cache_key] = prompt
+    return prompt
+
+
+def paddle_prompt_ids(processor, lang: Optional[str]):
+    """
+    Prompt token ids around the image placeholder, tokenized once per language:
+    (prefix_ids, image_token_id, suffix_ids), or None when the prompt has no single placeholder.
+    """
+    cache_key = (id(processor), lang)
+    if cache_key in _prompt_ids_cache:
+        return _prompt_ids_cache[cache_key]
+    pieces = None
+    tokenizer = getattr(processor, "tokenizer", None)
+    image_token = getattr(processor, "image_token", None) or "<|IMAGE_PLACEHOLDER|>"
+    prompt = build_paddle_prompt(processor, lang)
+    if tokenizer is not None and prompt.count(image_token) == 1:
+        prefix, suffix = prompt.split(image_token)
+        pieces = (
+            list(tokenizer(prefix)["input_ids"]),
+            tokenizer.convert_tokens_to_ids(image_token),
+            list(tokenizer(suffix, add_special_tokens=False)["input_ids"]),
+        )
+    _prompt_ids_cache[cache_key] = pieces
+    return pieces
+
+
+def _render_paddle_prompt(processor, lang: Optional[str]) -> str:
     lang_map = {"ja": "Japanese", "en": "English", "zh": "Chinese"}
     lang_name = lang_map.get(lang or "", "auto")
     prompt = (
@@ -157,3 +271,12 @@ def get_paddle_device():
     global _paddle_ocr_device
     return _paddle_ocr_device
 
+
+def get_paddle_precision():
+    """Precision of the loaded PaddleOCR-VL model ("fp32", "bf16", "int8", "fp16"), if any."""
+    return _paddle_ocr_precision
+
+
+def get_paddle_processor():
+    """Get loaded PaddleOCR-VL processor, if any (for services that only need its settings)."""
+    return _paddle_ocr_processor
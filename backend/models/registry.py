@@ -0,0 +1,175 @@
+"""
+Model residency registry.
+Tracks which models are loaded, their weight footprint and last use, and unloads the least
+recently used ones when their summed weight bytes exceed MODEL_WEIGHT_BUDGET_MB.
+"""
+import functools
+import gc
+import threading
+import time
+from typing import Callable, Dict
+
+from config import MODEL_WEIGHT_BUDGET_MB
+from logging_config import log_event
+
+_lock = threading.Lock()
+_models: Dict[str, dict] = {}
+
+
+def _entry(name: str) -> dict:
+    entry = _models.get(name)
+    if entry is None:
+        entry = {
+            "loaded": False,
+            "state": "unloaded",
+            "load_ms": None,
+            "loading_since": None,
+            "bytes": 0,
+            "last_used": None,
+            "loaded_at": None,
+            "loads": 0,
+            "unloads": 0,
+            "unload_fn": None,
+        }
+        _models[name] = entry
+    return entry
+
+
+def module_footprint_bytes(module) -> int:
+    """RAM held by a torch module's parameters and buffers (plus packed dynamic-quantized weights)."""
+    total = 0
+    for tensor in list(module.parameters()) + list(module.buffers()):
+        total += tensor.numel() * tensor.element_size()
+    for submodule in module.modules():
+        # Dynamic-quantized Linear layers keep their int8 weights in packed params, not parameters.
+        if hasattr(submodule, "_packed_params") and callable(getattr(submodule, "weight", None)):
+            weight = submodule.weight()
+            total += weight.numel() * weight.element_size()
+    return total
+
+
+def tracks_loading(name: str):
+    """Decorate a loader so the registry reports name as "loading" and times the load."""
+
+    def decorator(load_fn):
+        @functools.wraps(load_fn)
+        def wrapper(*args, **kwargs):
+            with _lock:
+                entry = _entry(name)
+                entry["loading_since"] = time.perf_counter()
+                if not entry["loaded"]:
+                    entry["state"] = "loading"
+            try:
+                return load_fn(*args, **kwargs)
+            finally:
+                with _lock:
+                    entry["loading_since"] = None
+                    if entry["state"] == "loading":
+                        entry["state"] = "loaded" if entry["loaded"] else "unloaded"
+
+        return wrapper
+
+    return decorator
+
+
+def touch(name: str):
+    """Mark a resident model as just used (LRU position)."""
+    with _lock:
+        entry = _models.get(name)
+        if entry is not None and entry["loaded"]:
+            entry["last_used"] = time.time()
+
+
+def _release_memory():
+    gc.collect()
+    try:
+        import torch
+
+        if torch.cuda.is_available():
+            torch.cuda.empty_cache()
+    except Exception:
+        pass
+
+
+def unload(name: str, logger, reason: str = "manual") -> bool:
+    """Unload a model through its registered unload function."""
+    with _lock:
+        entry = _models.get(name)
+        if entry is None or not entry["loaded"]:
+            return False
+        unload_fn = entry["unload_fn"]
+        entry["loaded"] = False
+        entry["state"] = "unloaded"
+        entry["unloads"] += 1
+        freed = entry["bytes"]
+        entry["bytes"] = 0
+    if unload_fn is not None:
+        unload_fn()
+    _release_memory()
+    log_event("[models] unloaded", logger, model=name, reason=reason, freed_mb=round(freed / (1024 * 1024), 1))
+    return True
+
+
+def register_loaded(name: str, footprint_bytes: int, unload_fn: Callable[[], None], logger):
+    """Record a freshly loaded model and evict least-recently-used models while over budget."""
+    now = time.time()
+    with _lock:
+        entry = _entry(name)
+        if entry["loading_since"] is not None:
+            entry["load_ms"] = int((time.perf_counter() - entry["loading_since"]) * 1000)
+        entry.update(
+            loaded=True,
+            state="loaded",
+            loading_since=None,
+            bytes=int(footprint_bytes),
+            last_used=now,
+            loaded_at=now,
+            unload_fn=unload_fn,
+        )
+        entry["loads"] += 1
+    log_event(
+        "[models] loaded",
+        logger,
+        model=name,
+        load_ms=_models[name]["load_ms"],
+        footprint_mb=round(footprint_bytes / (1024 * 1024), 1),
+        resident_mb=round(resident_bytes() / (1024 * 1024), 1),
+    )
+    enforce_budget(logger, keep=name)
+
+
+def resident_bytes() -> int:
+    return sum(entry["bytes"] for entry in _models.values() if entry["loaded"])
+
+
+def enforce_budget(logger, keep: str = None):
+    """Unload LRU models (never `keep`) until resident weight bytes fit MODEL_WEIGHT_BUDGET_MB."""
+    if MODEL_WEIGHT_BUDGET_MB <= 0:
+        return
+    budget = int(MODEL_WEIGHT_BUDGET_MB * 1024 * 1024)
+    while True:
+        with _lock:
+            if resident_bytes() <= budget:
+                return
+            candidates = [
+                (entry["last_used"] or 0, name)
+                for name, entry in _models.items()
+                if entry["loaded"] and name != keep
+            ]
+        if not candidates:
+            return
+        _, victim = min(candidates)
+        unload(victim, logger, reason="budget")
+
+
+def residency() -> dict:
+    """Current residency, footprints and load/unload counters for all known models."""
+    with _lock:
+        return {
+            "budget_bytes": int(MODEL_WEIGHT_BUDGET_MB * 1024 * 1024) if MODEL_WEIGHT_BUDGET_MB > 0 else None,
+            "resident_bytes": resident_bytes(),
+            "models": {
+                name: {k: v for k, v in entry.items() if k not in {"unload_fn", "loading_since"}}
+                for name, entry in _models.items()
+            },
+        }
@@ -3,28 +3,206 @@ Detection service.
 """
 import time
 import uuid
+from pathlib import Path
+from typing import List, Optional, Tuple
+
 import torch
 from transformers.utils import ModelOutput
 
-from models.detector import load_detector
-from utils.boxes import normalize_boxes, save_boxes_cache, suppress_overlaps
-from utils.image import ensure_image, resize_for_model
+from config import DETECT_BATCH_SIZE, DETECT_NMS_IOU
+from models.detector import detector_fingerprint, load_detector
+from services.result_cache import cache_get, cache_put, file_content_hash
+from utils.boxes import (
+    load_candidates_cache,
+    save_boxes_cache,
+    save_candidates_cache,
+    suppress_overlaps_array,
+)
+from utils.image import load_page
 from logging_config import log_event
 
 
-def to_cpu_tree(value):
-    """Recursively move tensors to CPU."""
-    if torch.is_tensor(value):
-        return value.to("cpu")
-    if isinstance(value, ModelOutput):
-        data = {k: to_cpu_tree(v) for k, v in value.items()}
-        return value.__class__(**data)
-    if isinstance(value, dict):
-        return {k: to_cpu_tree(v) for k, v in value.items()}
-    if isinstance(value, (list, tuple)):
-        converted = [to_cpu_tree(v) for v in value]
-        return tuple(converted) if isinstance(value, tuple) else converted
-    return value
+def detection_outputs_to_cpu(outputs):
+    """Move only the tensors post-processing needs (logits, pred_boxes) to CPU."""
+    output_cls = outputs.__class__ if isinstance(outputs, ModelOutput) else ModelOutput
+    return output_cls(
+        logits=outputs["logits"].to("cpu"),
+        pred_boxes=outputs["pred_boxes"].to("cpu"),
+    )
+
+
+def map_label(_label_id: int) -> str:
+    """Map detector label id to box type (every detector class is treated as a text bubble)."""
+    return "text_bubble"
+
+
+def candidates_to_boxes(
+    scores: torch.Tensor,
+    labels: torch.Tensor,
+    boxes_xyxy: torch.Tensor,
+    size: Tuple[int, int],
+    min_score: float,
+    allowed_types: set,
+    max_boxes: int,
+    iou_threshold: Optional[float] = None,
+) -> Tuple[List[dict], int]:
+    """
+    Filter post-processed candidates and return (normalized boxes sorted by score, candidate count).
+    Threshold, label filter, top-k ordering, xyxy->xywh, normalization and overlap suppression all
+    happen on tensors/arrays before any Python dict is built.
+    """
+    keep = scores >= min_score
+    label_ids = labels.unique().tolist()
+    allowed_ids = [label_id for label_id in label_ids if map_label(label_id) in allowed_types]
+    if len(allowed_ids) != len(label_ids):
+        keep &= torch.isin(labels, torch.tensor(allowed_ids, dtype=labels.dtype))
+    scores = scores[keep]
+    labels = labels[keep]
+    boxes_xyxy = boxes_xyxy[keep]
+    if scores.numel() == 0:
+        return [], 0
+
+    scores, order = torch.topk(scores, k=scores.numel(), sorted=True)
+    labels = labels[order]
+    boxes_xyxy = boxes_xyxy[order].float()
+
+    width, height = size
+    xywh = torch.cat([boxes_xyxy[:, :2], boxes_xyxy[:, 2:] - boxes_xyxy[:, :2]], dim=1)
+    xywh = xywh / torch.tensor([width, height, width, height], dtype=xywh.dtype)
+
+    candidate_count = scores.numel()
+    kept = torch.from_numpy(
+        suppress_overlaps_array(xywh.numpy(), scores.numpy(), int(max_boxes), iou_threshold)
+    )
+    scores, labels, xywh = scores[kept], labels[kept], xywh[kept]
+
+    boxes = [
+        {
+            "id": uuid.uuid4().hex,
+            "type": map_label(label_id),
+            "score": score,
+            "x": x,
+            "y": y,
+            "w": w,
+            "h": h,
+        }
+        for score, label_id, (x, y, w, h) in zip(scores.tolist(), labels.tolist(), xywh.tolist())
+    ]
+    return boxes, candidate_count
+
+
+def _finalize_page(file_id: str, results, size: Tuple[int, int], meta: dict, max_boxes: int, threshold: float, logger) -> dict:
+    """Filter, suppress and cache post-processed detections for a single page."""
+    if results is None:
+        log_event("[detect] no_results", logger, file_id=file_id, reason="post_process_empty", meta=meta)
+        return {
+            "boxes": [],
+            "meta": meta,
+        }
+
+    allowed_types = {"text_bubble"}
+    try:
+        min_score = float(threshold)
+    except Exception:
+        min_score = 0.66
+    min_score = max(0.0, min(0.99, min_score))
+
+    # Handle case when no detections are found
+    if "scores" not in results or len(results["scores"]) == 0:
+        log_event("[detect] no_results", logger, file_id=file_id, reason="scores_empty", meta=meta)
+        return {
+            "boxes": [],
+            "meta": meta,
+        }
+
+    boxes, before_suppress = candidates_to_boxes(
+        results["scores"],
+        results["labels"],
+        results["boxes"],
+        size,
+        min_score,
+        allowed_types,
+        int(max_boxes),
+        DETECT_NMS_IOU,
+    )
+    log_event(
+        "[detect] filtered_boxes",
+        logger,
+        file_id=file_id,
+        allowed_types=sorted(allowed_types),
+        min_score=min_score,
+        iou_threshold=DETECT_NMS_IOU,
+        before=before_suppress,
+        after=len(boxes),
+    )
+    try:
+        save_boxes_cache(file_id, boxes, logger, meta)
+    except Exception:
+        logger.exception("[detect] cache_save_failed", extra={"file_id": file_id})
+    log_event(
+        "[detect] boxes_ready",
+        logger,
+        file_id=file_id,
+        total=len(boxes),
+        top_scores=[round(b["score"], 4) for b in boxes[:5]],
+        meta=meta,
+    )
+    return {
+        "boxes": boxes[: int(max_boxes)],
+        "meta": meta,
+    }
+
+
+def _content_key(image_path: Path, detector: str) -> Optional[dict]:
+    """Content-addressed cache key for a page's detector candidates."""
+    try:
+        return {"sha256": file_content_hash(Path(image_path)), "detector": detector}
+    except OSError:
+        return None
+
+
+def _load_cached_candidates(file_id: str, image_path: Path, detector: str, logger) -> Optional[Tuple[dict, dict]]:
+    """
+    Return (post-processed results as tensors, meta) from the per-file candidates cache, falling
+    back to the content-addressed cache (same page bytes uploaded before under another id).
+    """
+    cached = load_candidates_cache(file_id, detector)
+    source = "file"
+    if cached is None:
+        content_key = _content_key(image_path, detector)
+        cached = cache_get("detect", content_key) if content_key else None
+        source = "content"
+        if cached is None:
+            return None
+        try:
+            save_candidates_cache(file_id, cached, cached["meta"], detector, logger)
+        except Exception:
+            logger.exception("[detect] candidates_save_failed", extra={"file_id": file_id})
+    results = {
+        "scores": torch.tensor(cached["scores"], dtype=torch.float32),
+        "labels": torch.tensor(cached["labels"], dtype=torch.int64),
+        "boxes": torch.tensor(cached["boxes"], dtype=torch.float32).reshape(-1, 4),
+    }
+    log_event("[detect] candidates_cache_hit", logger, file_id=file_id, source=source, count=len(cached["scores"]))
+    return results, cached["meta"]
+
+
+def _store_candidates(file_id: str, image_path: Path, results, meta: dict, detector: str, logger):
+    """Persist raw candidates next to .boxes.json and in the content cache (failures are logged, never raised)."""
+    if results is None:
+        return
+    candidates = {
+        "scores": results["scores"].tolist(),
+        "labels": results["labels"].tolist(),
+        "boxes": results["boxes"].tolist(),
+    }
+    try:
+        save_candidates_cache(file_id, candidates, meta, detector, logger)
+    except Exception:
+        logger.exception("[detect] candidates_save_failed", extra={"file_id": file_id})
+    content_key = _content_key(image_path, detector)
+    if content_key:
+        cache_put("detect", content_key, {**candidates, "meta": meta}, logger)
 
 
 def run_detection(file_id: str, image_path, max_boxes: int, threshold: float, logger):
@@ -38,8 +216,23 @@ def run_detection(file_id: str, image_path, max_boxes: int, threshold: float, lo
         threshold=float(threshold),
     )
 
-    img = ensure_image(image_path, logger)
-    resized, meta = resize_for_model(img)
+    detector = detector_fingerprint()
+    cached = _load_cached_candidates(file_id, image_path, detector, logger)
+    if cached is not None:
+        results, meta = cached
+        response = _finalize_page(file_id, results, tuple(meta["resized_size"]), meta, max_boxes, threshold, logger)
+        total_ms = int((time.perf_counter() - request_started) * 1000)
+        log_event(
+            "[detect] response",
+            logger,
+            file_id=file_id,
+            box_count=len(response["boxes"]),
+            duration_ms=total_ms,
+            cached=True,
+        )
+        return response
+
+    resized, meta = load_page(image_path, logger)
 
     try:
         det_model, det_processor = load_detector(logger)
@@ -57,95 +250,141 @@ def run_detection(file_id: str, image_path, max_boxes: int, threshold: float, lo
             resized_size=resized.size,
             orig_size=meta.get("orig_size"),
         )
-        device = next(det_model.parameters()).device
+        device = det_model.device
         inputs = {k: v.to(device) for k, v in inputs.items()}
         with torch.no_grad():
             outputs = det_model(**inputs)
         log_event("[detect] outputs_type", logger, type=type(outputs).__name__)
         inference_ms = int((time.perf_counter() - prep_started) * 1000)
         log_event("[detect] inference_complete", logger, duration_ms=inference_ms)
-        outputs = to_cpu_tree(outputs)
+        outputs = detection_outputs_to_cpu(outputs)
         target_sizes = torch.tensor([[resized.height, resized.width]], dtype=torch.int64)
         post_processed = det_processor.post_process_object_detection(
             outputs, threshold=0.001, target_sizes=target_sizes
         )
         results = post_processed[0] if post_processed else None
+        _store_candidates(file_id, image_path, results, meta, detector, logger)
 
-        if results is None:
-            log_event("[detect] no_results", logger, reason="post_process_empty", meta=meta)
-            return {
-                "boxes": [],
-                "meta": meta,
-            }
-
-        boxes = []
-        allowed_types = {"text_bubble"}
-        try:
-            min_score = float(threshold)
-        except Exception:
-            min_score = 0.66
-        min_score = max(0.0, min(0.99, min_score))
-
-        # Handle case when no detections are found
-        if "scores" not in results or len(results["scores"]) == 0:
-            log_event("[detect] no_results", logger, reason="scores_empty", meta=meta)
-            return {
-                "boxes": [],
-                "meta": meta,
-            }
-
-        for score, _label_id, box in zip(results["scores"], results["labels"], results["boxes"]):
-            mapped_label = "text_bubble"
-            score_val = float(score.item())
-            if score_val < min_score:
-                continue
-            if mapped_label not in allowed_types:
-                continue
-            boxes.append(
-                {
-                    "id": uuid.uuid4().hex,
-                    "type": mapped_label,
-                    "score": score_val,
-                    "x": float(box[0].item()),
-                    "y": float(box[1].item()),
-                    "w": float(box[2].item() - box[0].item()),
-                    "h": float(box[3].item() - box[1].item()),
-                }
-            )
-
-        before_suppress = len(boxes)
-        boxes = suppress_overlaps(boxes, int(max_boxes))
-        log_event(
-            "[detect] filtered_boxes",
-            logger,
-            allowed_types=sorted(allowed_types),
-            min_score=min_score,
-            before=before_suppress,
-            after=len(boxes),
-        )
-        boxes = normalize_boxes(boxes, (resized.width, resized.height))
-        try:
-            save_boxes_cache(file_id, boxes, logger, meta)
-        except Exception:
-            logger.exception("[detect] cache_save_failed", extra={"file_id": file_id})
-        log_event(
-            "[detect] boxes_ready",
-            logger,
-            total=len(boxes),
-            top_scores=[round(b["score"], 4) for b in boxes[:5]],
-            meta=meta,
-        )
-
-        response = {
-            "boxes": boxes[: int(max_boxes)],
-            "meta": meta,
-        }
+        response = _finalize_page(file_id, results, resized.size, meta, max_boxes, threshold, logger)
         total_ms = int((time.perf_counter() - request_started) * 1000)
         log_event("[detect] response", logger, file_id=file_id, box_count=len(response["boxes"]), duration_ms=total_ms)
         return response
     except Exception as exc:
-        import traceback
-        error_detail = f"Detection error: {str(exc)}\n{traceback.format_exc()}"
         logger.exception("[detect] error processing file_id=%s", file_id)
         raise RuntimeError(f"Detection failed: {str(exc)}") from exc
 
+
+def run_detection_many(
+    pages: List[Tuple[str, Path]],
+    max_boxes: int,
+    threshold: float,
+    logger,
+    batch_size: Optional[int] = None,
+) -> List[dict]:
+    """
+    Run detection on several pages, stacking up to batch_size pages per forward pass.
+    Returns one response per page (same shape as run_detection plus file_id), in input order; a
+    page whose load, chunk or post-processing failed gets {"boxes": [], "error": ...} instead.
+    """
+    request_started = time.perf_counter()
+    batch_size = max(1, int(batch_size or DETECT_BATCH_SIZE))
+    log_event(
+        "[detect-batch] request",
+        logger,
+        pages=len(pages),
+        batch_size=batch_size,
+        max_boxes=int(max_boxes),
+        threshold=float(threshold),
+    )
+
+    detector = detector_fingerprint()
+    responses = []
+    pending = []
+    for file_id, image_path in pages:
+        cached = _load_cached_candidates(file_id, image_path, detector, logger)
+        if cached is None:
+            pending.append((file_id, image_path))
+            continue
+        results, meta = cached
+        response = _finalize_page(file_id, results, tuple(meta["resized_size"]), meta, max_boxes, threshold, logger)
+        responses.append({"file_id": file_id, "cached": True, **response})
+
+    if pending:
+        try:
+            det_model, det_processor = load_detector(logger)
+        except Exception as exc:
+            logger.exception("[detect-batch] load_detector failed")
+            error = f"Detector not available: {exc}"
+            responses.extend({"file_id": file_id, "boxes": [], "meta": None, "error": error} for file_id, _ in pending)
+            pending = []
+        else:
+            device = det_model.device
+
+    for start in range(0, len(pending), batch_size):
+        chunk = pending[start : start + batch_size]
+        loaded = []
+        for file_id, image_path in chunk:
+            try:
+                resized, meta = load_page(image_path, logger)
+            except Exception as exc:
+                detail = getattr(exc, "detail", None) or str(exc)
+                responses.append({"file_id": file_id, "boxes": [], "meta": None, "error": detail})
+                continue
+            loaded.append((file_id, image_path, resized, meta))
+        if not loaded:
+            continue
+
+        try:
+            prep_started = time.perf_counter()
+            inputs = det_processor(images=[resized for _, _, resized, _ in loaded], return_tensors="pt")
+            inputs = {k: v.to(device) for k, v in inputs.items()}
+            with torch.no_grad():
+                outputs = det_model(**inputs)
+            inference_ms = int((time.perf_counter() - prep_started) * 1000)
+            log_event(
+                "[detect-batch] inference_complete",
+                logger,
+                batch=len(loaded),
+                duration_ms=inference_ms,
+                per_page_ms=inference_ms // len(loaded),
+            )
+            outputs = detection_outputs_to_cpu(outputs)
+            target_sizes = torch.tensor(
+                [[resized.height, resized.width] for _, _, resized, _ in loaded], dtype=torch.int64
+            )
+            post_processed = det_processor.post_process_object_detection(
+                outputs, threshold=0.001, target_sizes=target_sizes
+            )
+        except Exception as exc:
+            # Only this chunk's pages fail; pages already detected are kept.
+            logger.exception("[detect-batch] error processing batch starting at %d", start)
+            error = f"Detection failed: {exc}"
+            responses.extend(
+                {"file_id": file_id, "boxes": [], "meta": None, "error": error} for file_id, _, _, _ in loaded
+            )
+            continue
+
+        for idx, (file_id, image_path, resized, meta) in enumerate(loaded):
+            try:
+                results = post_processed[idx] if idx < len(post_processed) else None
+                _store_candidates(file_id, image_path, results, meta, detector, logger)
+                response = _finalize_page(file_id, results, resized.size, meta, max_boxes, threshold, logger)
+            except Exception as exc:
+                logger.exception("[detect-batch] error finalizing file_id=%s", file_id)
+                responses.append({"file_id": file_id, "boxes": [], "meta": None, "error": f"Detection failed: {exc}"})
+                continue
+            responses.append({"file_id": file_id, **response})
+
+    order = {file_id: idx for idx, (file_id, _) in enumerate(pages)}
+    responses.sort(key=lambda r: order.get(r["file_id"], len(order)))
+    total_ms = int((time.perf_counter() - request_started) * 1000)
+    log_event(
+        "[detect-batch] response",
+        logger,
+        pages=len(responses),
+        cached=sum(1 for r in responses if r.get("cached")),
+        failed=sum(1 for r in responses if r.get("error")),
+        box_count=sum(len(r["boxes"]) for r in responses),
+        duration_ms=total_ms,
+    )
+    return responses
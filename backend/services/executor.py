@@ -0,0 +1,48 @@
+"""
+Inference executors.
+Blocking work is moved off the asyncio event loop: a bounded thread pool handles I/O and image
+decoding, and every model/device pair gets its own single-consumer worker thread so requests for
+the same model queue up instead of running concurrently on one set of weights.
+"""
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict
+
+from config import IO_WORKERS
+
+_io_executor = ThreadPoolExecutor(max_workers=IO_WORKERS, thread_name_prefix="io")
+_model_executors: Dict[str, ThreadPoolExecutor] = {}
+_model_lock = threading.Lock()
+
+
+def model_executor(model_key: str) -> ThreadPoolExecutor:
+    """Get (or create) the single worker thread that owns model_key."""
+    with _model_lock:
+        executor = _model_executors.get(model_key)
+        if executor is None:
+            executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"model-{model_key}")
+            _model_executors[model_key] = executor
+        return executor
+
+
+async def run_io(fn: Callable, *args, **kwargs):
+    """Run blocking I/O or decoding work on the shared I/O pool."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_io_executor, functools.partial(fn, *args, **kwargs))
+
+
+async def run_model(model_key: str, fn: Callable, *args, **kwargs):
+    """Run blocking inference on the dedicated worker for model_key (e.g. "manga-ocr:cuda")."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(model_executor(model_key), functools.partial(fn, *args, **kwargs))
+
+
+def shutdown_executors():
+    """Stop all executors (called on app shutdown)."""
+    _io_executor.shutdown(wait=False, cancel_futures=True)
+    with _model_lock:
+        for executor in _model_executors.values():
+            executor.shutdown(wait=False, cancel_futures=True)
+        _model_executors.clear()
@@ -1,20 +1,100 @@
 """
 OCR service.
 """
+import contextlib
+import hashlib
+import json
 import math
+import threading
 import time
 import numpy as np
 import torch
 from PIL import Image
-from typing import Optional
+from transformers.generation.stopping_criteria import StoppingCriteria, StoppingCriteriaList
+from transformers.generation.streamers import BaseStreamer
+from typing import Callable, List, Optional
 
-from models.manga_ocr import load_manga_ocr
-from models.paddleocr_vl import build_paddle_prompt, get_paddle_device, load_paddleocr_vl
+from config import (
+    MANGA_OCR_ENGINE,
+    OCR_CROP_PAD_RATIO,
+    PADDLE_OCR_BATCH_SIZE,
+    PADDLE_OCR_CPU_PRECISION,
+    PADDLE_OCR_BUCKET_MAX_NEW_TOKENS_DELTA,
+    PADDLE_OCR_BUCKET_TOKEN_RATIO,
+    TOKEN_BUDGET,
+)
+from models.manga_ocr import get_loaded_manga_ocr, get_manga_ocr_post_process, load_manga_ocr
+from models.paddleocr_vl import (
+    build_paddle_prompt,
+    get_paddle_device,
+    get_paddle_precision,
+    get_paddle_processor,
+    load_paddleocr_vl,
+    paddle_prompt_ids,
+    prompt_inputs_verified,
+)
 from utils.device import resolve_ocr_device
 from utils.image import crop_box
 from utils.text import normalize_punctuation
 from logging_config import log_event
 
+OCR_MODELS = ("manga-ocr", "paddleocr-vl")
+# manga-ocr max_length (decoder tokens incl. start/end) when no learned budget is fitted
+MANGA_OCR_MAX_LENGTH = 300
+# Fingerprint of each model's fitted budget parameters: page-level cache keys carry it, so text
+# generated under an older budget fit is not served after a refit.
+_TOKEN_BUDGET_FINGERPRINTS = {
+    model_id: hashlib.sha256(json.dumps(params, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+    for model_id, params in TOKEN_BUDGET.items()
+    if params
+}
+
+
+class BoxDeltaStreamer(BaseStreamer):
+    """
+    generate() streamer for a batch of crops: after each decoding step, reports every row whose
+    decoded text grew via on_delta(row, text, delta). delta is None when the text changed other
+    than by appending (e.g. post-processing rewrote it).
+    """
+
+    def __init__(self, decode: Callable[[List[int]], str], rows: int, on_delta):
+        self.decode = decode
+        self.on_delta = on_delta
+        self.tokens = [[] for _ in range(rows)]
+        self.texts = [""] * rows
+        self.prompt_seen = False
+
+    def put(self, value):
+        if not self.prompt_seen:
+            # First call carries the prompt / decoder start ids, not generated tokens.
+            self.prompt_seen = True
+            return
+        for row, new_ids in enumerate(value.reshape(len(self.tokens), -1).tolist()):
+            self.tokens[row].extend(new_ids)
+            text = self.decode(self.tokens[row])
+            previous = self.texts[row]
+            if text == previous or text.endswith("\ufffd"):
+                continue
+            self.texts[row] = text
+            self.on_delta(row, text, text[len(previous):] if text.startswith(previous) else None)
+
+    def end(self):
+        pass
+
+
+class CancelCriteria(StoppingCriteria):
+    """Stops generate() for every row once cancel_event is set (e.g. the SSE client went away)."""
+
+    def __init__(self, cancel_event):
+        self.cancel_event = cancel_event
+
+    def __call__(self, input_ids, scores, **kwargs):
+        return torch.full((input_ids.shape[0],), self.cancel_event.is_set(), dtype=torch.bool, device=input_ids.device)
+
+
+def _stopping_criteria(cancel_event):
+    return StoppingCriteriaList([CancelCriteria(cancel_event)]) if cancel_event is not None else None
+
 
 def normalize_ocr_text(text: str) -> str:
     """Normalize OCR text output."""
@@ -37,6 +117,77 @@ def normalize_ocr_text(text: str) -> str:
     return cleaned
 
 
+def _with_engine(key: dict, model_id: str) -> dict:
+    """Tag cache keys with a non-default engine so quantized and float results never mix."""
+    if model_id == "manga-ocr" and MANGA_OCR_ENGINE != "torch":
+        key["engine"] = MANGA_OCR_ENGINE
+    elif model_id == "paddleocr-vl" and PADDLE_OCR_CPU_PRECISION != "fp32":
+        key["engine"] = PADDLE_OCR_CPU_PRECISION
+    return key
+
+
+def ocr_content_key(page_hash: str, model_id: str, lang: Optional[str], box: dict) -> dict:
+    """
+    Content-addressed cache key for one box: page bytes + model + params + box geometry, plus the
+    budget fit and box type when a learned token budget applies (the per-crop budget follows from them).
+    """
+    coords = []
+    for k in ("x", "y", "w", "h"):
+        try:
+            coords.append(round(float(box.get(k, 0.0)), 6))
+        except (TypeError, ValueError):
+            coords.append(0.0)
+    key = {
+        "sha256": page_hash,
+        "model": model_id,
+        "lang": (lang or "").lower(),
+        "box": coords,
+        "pad": OCR_CROP_PAD_RATIO,
+    }
+    budget_fingerprint = _TOKEN_BUDGET_FINGERPRINTS.get(model_id)
+    if budget_fingerprint is not None:
+        key["token_budget"] = budget_fingerprint
+        key["type"] = box.get("type")
+    return _with_engine(key, model_id)
+
+
+def ocr_crop_key(crop_hash: str, model_id: str, lang: Optional[str], max_new_tokens: Optional[int]) -> dict:
+    """Per-crop cache key: padded crop pixels + model + language + generation budget."""
+    key = {
+        "crop": crop_hash,
+        "model": model_id,
+        "lang": (lang or "").lower(),
+        "max_new_tokens": max_new_tokens,
+    }
+    return _with_engine(key, model_id)
+
+
+def learned_token_budget(model_id: str, crop: Image.Image, box_type: Optional[str] = None) -> Optional[int]:
+    """Token budget from the fitted quantile model in TOKEN_BUDGET (None when none was fitted)."""
+    params = TOKEN_BUDGET.get(model_id)
+    if not params:
+        return None
+    width, height = max(1, crop.width), max(1, crop.height)
+    coef = params.get("coef", {})
+    value = (
+        coef.get("intercept", 0.0)
+        + coef.get("sqrt_area", 0.0) * math.sqrt(width * height)
+        + coef.get("log_aspect", 0.0) * math.log(height / width)
+        + params.get("type_offset", {}).get(box_type or "", 0.0)
+        + params.get("margin", 0)
+    )
+    return max(params.get("min_tokens", 1), min(params.get("max_tokens", 512), int(math.ceil(value))))
+
+
+def ocr_max_new_tokens(model_id: str, crop: Image.Image, box_type: Optional[str] = None) -> Optional[int]:
+    """Generation budget a model would use for this crop (None when the model has no budget)."""
+    if model_id == "paddleocr-vl":
+        return paddle_max_new_tokens(crop, box_type)
+    if model_id == "manga-ocr":
+        return learned_token_budget(model_id, crop, box_type)
+    return None
+
+
 def run_manga_ocr(crop: Image.Image, device: torch.device, logger) -> str:
     """Run manga-ocr on crop."""
     model = load_manga_ocr(device, logger)
@@ -53,25 +204,269 @@ def run_manga_ocr(crop: Image.Image, device: torch.device, logger) -> str:
     return normalize_ocr_text(text)
 
 
-def run_paddleocr_vl(crop: Image.Image, device: torch.device, lang: Optional[str], logger) -> str:
-    """Run PaddleOCR-VL on crop."""
-    model, processor = load_paddleocr_vl(device, logger)
-    paddle_device = get_paddle_device() or next(model.parameters()).device
+def prepare_manga_ocr_batch(crops: List[Image.Image], device: torch.device):
+    """
+    manga-ocr preprocessing (pixel_values) for run_manga_ocr_batch, safe to run off the model
+    thread. Returns None while the model is not loaded yet.
+    """
+    model = get_loaded_manga_ocr(device)
+    if model is None:
+        return None
+    return model.processor([np.array(crop) for crop in crops], return_tensors="pt").pixel_values
+
+
+def run_manga_ocr_batch(
+    crops: List[Image.Image],
+    device: torch.device,
+    logger,
+    budgets: Optional[List[Optional[int]]] = None,
+    on_delta=None,
+    cancel_event=None,
+    prepared=None,
+) -> List[str]:
+    """
+    Run manga-ocr on several crops: one processor call, one padded generate, per-crop decode.
+    max_length is the largest per-crop budget (MANGA_OCR_MAX_LENGTH for crops without one); each
+    row is then cut at its own budget, so a crop's text does not depend on its batch.
+    on_delta(row, text, delta) receives partial text while decoding; setting cancel_event stops
+    generation early. prepared is the output of prepare_manga_ocr_batch, if already computed.
+    """
+    if not crops:
+        return []
+    if budgets is None:
+        budgets = [ocr_max_new_tokens("manga-ocr", crop) for crop in crops]
+    max_length = max(budget or MANGA_OCR_MAX_LENGTH for budget in budgets)
+    model = load_manga_ocr(device, logger)
+    post_process = get_manga_ocr_post_process(model)
+    start = time.perf_counter()
+    pixel_values = prepared
+    if pixel_values is None:
+        pixel_values = model.processor([np.array(crop) for crop in crops], return_tensors="pt").pixel_values
+    streamer = None
+    if on_delta is not None:
+        streamer = BoxDeltaStreamer(
+            lambda ids: post_process(model.tokenizer.decode(ids, skip_special_tokens=True)), len(crops), on_delta
+        )
+    with torch.no_grad():
+        generated = model.model.generate(
+            pixel_values.to(model.model.device),
+            max_length=max_length,
+            streamer=streamer,
+            stopping_criteria=_stopping_criteria(cancel_event),
+        ).cpu()
+    texts = [
+        normalize_ocr_text(
+            post_process(model.tokenizer.decode(token_ids[: budget or MANGA_OCR_MAX_LENGTH], skip_special_tokens=True))
+        )
+        for token_ids, budget in zip(generated, budgets)
+    ]
+    duration_ms = int((time.perf_counter() - start) * 1000)
+    log_event(
+        "[ocr] manga_ocr_batch",
+        logger,
+        duration_ms=duration_ms,
+        batch=len(crops),
+        per_box_ms=duration_ms // len(crops),
+        max_length=max_length,
+        preprocessed=prepared is not None,
+    )
+    return texts
+
+
+def paddle_max_new_tokens(crop: Image.Image, box_type: Optional[str] = None) -> int:
+    """Learned budget when fitted, else adaptive max_new_tokens based on bubble size with a fixed minimum."""
+    learned = learned_token_budget("paddleocr-vl", crop, box_type)
+    if learned is not None:
+        return learned
+    area = max(1, crop.width * crop.height)
+    max_new_tokens = int(round(0.13 * math.sqrt(area)))
+    return max(18, min(64, max_new_tokens))
+
+
+def paddle_vision_tokens(crop: Image.Image, processor=None) -> int:
+    """Estimate how many vision tokens PaddleOCR-VL's image processor produces for a crop."""
+    image_processor = getattr(processor, "image_processor", None)
+    patch_size = getattr(image_processor, "patch_size", None) or 14
+    merge_size = getattr(image_processor, "merge_size", None) or 2
+    factor = patch_size * merge_size
+    grid_h = max(1, round(crop.height / factor))
+    grid_w = max(1, round(crop.width / factor))
+    return grid_h * grid_w
+
+
+def bucket_paddle_crops(
+    crops: List[Image.Image], processor=None, budgets: Optional[List[int]] = None
+) -> List[List[int]]:
+    """
+    Group crop indices into generation buckets of similar vision-token count and max_new_tokens,
+    so padding inside a batch stays small. Buckets hold at most PADDLE_OCR_BATCH_SIZE crops.
+    """
+    keyed = sorted(
+        (
+            paddle_vision_tokens(crop, processor),
+            budgets[idx] if budgets else paddle_max_new_tokens(crop),
+            idx,
+        )
+        for idx, crop in enumerate(crops)
+    )
+    buckets: List[List[int]] = []
+    current: List[int] = []
+    first_tokens = first_budget = 0
+    for vision_tokens, budget, idx in keyed:
+        if current and (
+            len(current) >= PADDLE_OCR_BATCH_SIZE
+            or vision_tokens > first_tokens * PADDLE_OCR_BUCKET_TOKEN_RATIO
+            or abs(budget - first_budget) > PADDLE_OCR_BUCKET_MAX_NEW_TOKENS_DELTA
+        ):
+            buckets.append(current)
+            current = []
+        if not current:
+            first_tokens, first_budget = vision_tokens, budget
+        current.append(idx)
+    if current:
+        buckets.append(current)
+    return buckets
+
+
+def _paddle_streamer(processor, rows: int, on_delta):
+    if on_delta is None:
+        return None
+    tokenizer = getattr(processor, "tokenizer", processor)
+    return BoxDeltaStreamer(lambda ids: tokenizer.decode(ids, skip_special_tokens=True), rows, on_delta)
+
+
+# The batch path flips the shared tokenizer's padding_side, so processor calls are serialized.
+_paddle_processor_lock = threading.Lock()
+# Memoized-prompt inputs are used for a (processor, lang, batched) key only after they matched the
+# processor's own output once (prompt_inputs_verified); hits/lookups feed prompt_cache_hit_rate.
+_prompt_memo_stats = {"hits": 0, "lookups": 0}
+_prompt_memo_lock = threading.Lock()
+
+
+def _processor_inputs(processor, crops: List[Image.Image], lang: Optional[str]) -> dict:
     prompt = build_paddle_prompt(processor, lang)
-    inputs = processor(images=crop, text=prompt, return_tensors="pt")
+    if len(crops) == 1:
+        return dict(processor(images=crops[0], text=prompt, return_tensors="pt"))
+    tokenizer = getattr(processor, "tokenizer", None)
+    padding_side = getattr(tokenizer, "padding_side", None)
+    if tokenizer is not None:
+        tokenizer.padding_side = "left"
+    try:
+        return dict(processor(images=crops, text=[prompt] * len(crops), padding=True, return_tensors="pt"))
+    finally:
+        if tokenizer is not None and padding_side is not None:
+            tokenizer.padding_side = padding_side
+
+
+def _memoized_inputs(processor, crops: List[Image.Image], lang: Optional[str]) -> Optional[dict]:
+    """
+    Processor-equivalent inputs from the per-language prompt ids: only the images are processed and
+    the placeholder is expanded to each crop's vision-token count (rows left-padded).
+    """
+    pieces = paddle_prompt_ids(processor, lang)
+    image_processor = getattr(processor, "image_processor", None)
+    if pieces is None or image_processor is None:
+        return None
+    prefix_ids, image_token_id, suffix_ids = pieces
+    image_inputs = dict(image_processor(images=crops, return_tensors="pt"))
+    grid = image_inputs.get("image_grid_thw")
+    if grid is None or len(grid) != len(crops):
+        return None
+    merge = getattr(image_processor, "merge_size", 2) ** 2
+    rows = [prefix_ids + [image_token_id] * (int(thw.prod()) // merge) + suffix_ids for thw in grid]
+    width = max(len(row) for row in rows)
+    pad_id = getattr(getattr(processor, "tokenizer", None), "pad_token_id", None) or 0
+    input_ids = torch.tensor([[pad_id] * (width - len(row)) + row for row in rows], dtype=torch.long)
+    attention_mask = torch.tensor([[0] * (width - len(row)) + [1] * len(row) for row in rows], dtype=torch.long)
+    return {"input_ids": input_ids, "attention_mask": attention_mask, **image_inputs}
+
+
+def _same_inputs(a: dict, b: dict) -> bool:
+    return a.keys() == b.keys() and all(torch.equal(a[k], b[k]) for k in a)
+
+
+def prompt_cache_hit_rate() -> Optional[float]:
+    """Share of PaddleOCR-VL input builds served from the memoized prompt ids (None before any)."""
+    with _prompt_memo_lock:
+        lookups = _prompt_memo_stats["lookups"]
+        return round(_prompt_memo_stats["hits"] / lookups, 3) if lookups else None
+
+
+def _paddle_inputs(processor, crops: List[Image.Image], lang: Optional[str]) -> dict:
+    """CPU processor outputs for one crop or a left-padded batch of crops."""
+    memo_key = (id(processor), lang, len(crops) > 1)
+    inputs = _memoized_inputs(processor, crops, lang) if prompt_inputs_verified.get(memo_key) else None
+    with _prompt_memo_lock:
+        _prompt_memo_stats["lookups"] += 1
+        _prompt_memo_stats["hits"] += inputs is not None
+    if inputs is not None:
+        return inputs
+    with _paddle_processor_lock:
+        inputs = _processor_inputs(processor, crops, lang)
+        if memo_key not in prompt_inputs_verified:
+            try:
+                memoized = _memoized_inputs(processor, crops, lang)
+            except Exception:
+                memoized = None
+            prompt_inputs_verified[memo_key] = memoized is not None and _same_inputs(memoized, inputs)
+    return inputs
+
+
+def prepare_paddleocr_vl_batch(crops: List[Image.Image], lang: Optional[str]):
+    """
+    PaddleOCR-VL preprocessing for run_paddleocr_vl_batch, safe to run off the model thread.
+    Returns None while the processor is not loaded yet.
+    """
+    processor = get_paddle_processor()
+    if processor is None or not crops:
+        return None
+    return _paddle_inputs(processor, crops, lang)
+
+
+def _paddle_device_inputs(inputs: dict, paddle_device) -> dict:
     inputs = {k: v.to(paddle_device) for k, v in inputs.items()}
     if paddle_device.type == "cuda":
         inputs = {k: (v.half() if torch.is_floating_point(v) else v) for k, v in inputs.items()}
-    area = max(1, crop.width * crop.height)
-    # Adaptive max_new_tokens based on bubble size, with a fixed minimum.
-    max_new_tokens = int(round(0.13 * math.sqrt(area)))
-    max_new_tokens = max(18, min(64, max_new_tokens))
+    elif get_paddle_precision() == "bf16":
+        inputs = {k: (v.bfloat16() if torch.is_floating_point(v) else v) for k, v in inputs.items()}
+    return inputs
+
+
+def _paddle_autocast():
+    """bf16 autocast on CPU for ops whose inputs are still float32 (no-op for other precisions)."""
+    if get_paddle_precision() == "bf16" and get_paddle_device() is not None and get_paddle_device().type == "cpu":
+        return torch.autocast("cpu", dtype=torch.bfloat16)
+    return contextlib.nullcontext()
+
+
+def run_paddleocr_vl(
+    crop: Image.Image,
+    device: torch.device,
+    lang: Optional[str],
+    logger,
+    max_new_tokens: Optional[int] = None,
+    on_delta=None,
+    cancel_event=None,
+    prepared=None,
+) -> str:
+    """
+    Run PaddleOCR-VL on crop (on_delta(row, text, delta) receives partial text while decoding;
+    setting cancel_event stops generation early; prepared comes from prepare_paddleocr_vl_batch).
+    """
+    model, processor = load_paddleocr_vl(device, logger)
+    paddle_device = get_paddle_device() or next(model.parameters()).device
+    if prepared is None:
+        prepared = _paddle_inputs(processor, [crop], lang)
+    inputs = _paddle_device_inputs(prepared, paddle_device)
+    max_new_tokens = max_new_tokens or paddle_max_new_tokens(crop)
     start = time.perf_counter()
-    with torch.no_grad():
+    with torch.no_grad(), _paddle_autocast():
         generated = model.generate(
             **inputs,
             do_sample=False,
             max_new_tokens=max_new_tokens,
+            streamer=_paddle_streamer(processor, 1, on_delta),
+            stopping_criteria=_stopping_criteria(cancel_event),
         )
     duration_ms = int((time.perf_counter() - start) * 1000)
     input_len = inputs.get("input_ids").shape[-1] if "input_ids" in inputs else 0
@@ -85,5 +480,72 @@ def run_paddleocr_vl(crop: Image.Image, device: torch.device, lang: Optional[str
         duration_ms=duration_ms,
         max_new_tokens=max_new_tokens,
         crop_size=(crop.width, crop.height),
+        prompt_cache_hit_rate=prompt_cache_hit_rate(),
     )
     return normalize_ocr_text(text)
+
+
+def run_paddleocr_vl_batch(
+    crops: List[Image.Image],
+    device: torch.device,
+    lang: Optional[str],
+    logger,
+    budgets: Optional[List[int]] = None,
+    on_delta=None,
+    cancel_event=None,
+    prepared=None,
+) -> List[str]:
+    """
+    Run PaddleOCR-VL on one bucket of crops: left-padded prompts, a single generate call with the
+    bucket's largest max_new_tokens, then per-row trimming at input_len and at the row's own budget
+    (so a crop's text does not depend on its batch) and decoding.
+    prepared is the output of prepare_paddleocr_vl_batch, if already computed.
+    """
+    if not crops:
+        return []
+    if len(crops) == 1:
+        return [
+            run_paddleocr_vl(
+                crops[0], device, lang, logger, budgets[0] if budgets else None, on_delta, cancel_event, prepared
+            )
+        ]
+    model, processor = load_paddleocr_vl(device, logger)
+    paddle_device = get_paddle_device() or next(model.parameters()).device
+    if prepared is None:
+        prepared = _paddle_inputs(processor, crops, lang)
+    inputs = _paddle_device_inputs(prepared, paddle_device)
+    budgets = budgets or [paddle_max_new_tokens(crop) for crop in crops]
+    max_new_tokens = max(budgets)
+    start = time.perf_counter()
+    with torch.no_grad(), _paddle_autocast():
+        generated = model.generate(
+            **inputs,
+            do_sample=False,
+            max_new_tokens=max_new_tokens,
+            streamer=_paddle_streamer(processor, len(crops), on_delta),
+            stopping_criteria=_stopping_criteria(cancel_event),
+        )
+    duration_ms = int((time.perf_counter() - start) * 1000)
+    input_len = inputs.get("input_ids").shape[-1] if "input_ids" in inputs else 0
+    if input_len:
+        generated = generated[:, input_len:]
+    if min(budgets) < generated.shape[-1]:
+        # Tokens past a row's own budget become padding, which decoding skips.
+        pad_id = getattr(getattr(processor, "tokenizer", None), "pad_token_id", None) or 0
+        beyond = torch.arange(generated.shape[-1], device=generated.device)[None, :] >= torch.tensor(
+            budgets, device=generated.device
+        )[:, None]
+        generated = generated.masked_fill(beyond, pad_id)
+    decoded = processor.post_process_image_text_to_text(generated, skip_special_tokens=True)
+    texts = [normalize_ocr_text(decoded[i] if i < len(decoded) else "") for i in range(len(crops))]
+    log_event(
+        "[ocr] paddleocr_vl_batch",
+        logger,
+        duration_ms=duration_ms,
+        batch=len(crops),
+        per_box_ms=duration_ms // len(crops),
+        max_new_tokens=max_new_tokens,
+        input_len=input_len,
+        prompt_cache_hit_rate=prompt_cache_hit_rate(),
+    )
+    return texts
@@ -0,0 +1,585 @@
+"""
+OCR pipeline shared by /api/ocr, /api/ocr/stream and /api/ocr/volume.
+Routes boxes to models, answers from the result cache, collapses duplicate crops and batches the
+remaining crops per model before handing them to the model workers (or the CPU worker pool).
+Batches run concurrently and results are yielded in completion order. A volume job feeds pages
+one after another into the same batching state, so batches span page boundaries.
+Work is pipelined: pages decode and boxes are cropped/hashed ahead on the I/O pool, and the next
+batches are preprocessed there while the model worker generates the current one.
+"""
+import asyncio
+import functools
+import math
+import threading
+import time
+import uuid
+
+from collections import deque
+from contextlib import aclosing
+
+from config import (
+    MANGA_OCR_BATCH_SIZE,
+    OCR_DEDUP_MAX_DISTANCE,
+    OCR_PREFETCH_BATCHES,
+    OCR_PREFETCH_BOXES,
+    OCR_VOLUME_PREFETCH_PAGES,
+    PADDLE_OCR_BATCH_SIZE,
+)
+from logging_config import log_event
+from models.paddleocr_vl import get_paddle_processor
+from services.executor import run_io, run_model
+from services.ocr import (
+    OCR_MODELS,
+    bucket_paddle_crops,
+    ocr_content_key,
+    ocr_crop_key,
+    ocr_max_new_tokens,
+    prepare_manga_ocr_batch,
+    prepare_paddleocr_vl_batch,
+    run_manga_ocr_batch,
+    run_paddleocr_vl_batch,
+)
+from services.ocr_workers import ocr_pool_enabled, ocr_pool_size, run_in_ocr_pool
+from services.result_cache import cache_get, cache_put, file_content_hash
+from utils.device import resolve_ocr_device
+from utils.image import crop_box, crop_dhash, crop_pixel_hash, load_page, resolve_image_path
+
+# Crops whose width or height differ by more than this ratio are never treated as duplicates.
+_DEDUP_SIZE_TOLERANCE = 0.15
+
+
+def _same_shape(a, b) -> bool:
+    return (
+        abs(a.width - b.width) <= _DEDUP_SIZE_TOLERANCE * max(a.width, b.width)
+        and abs(a.height - b.height) <= _DEDUP_SIZE_TOLERANCE * max(a.height, b.height)
+    )
+
+
+def _tag(result, file_id):
+    if file_id is not None:
+        result["file_id"] = file_id
+    return result
+
+
+async def _single_page(box_list, resized, page_hash):
+    yield {"file_id": None, "boxes": box_list, "resized": resized, "page_hash": page_hash}
+
+
+async def _run_ahead(items, stage, depth: int):
+    """Yield stage(item) for each item in order, keeping up to `depth` items running ahead on the I/O pool."""
+    pending = deque()
+    items = iter(items)
+    try:
+        while True:
+            while len(pending) < depth:
+                item = next(items, None)
+                if item is None:
+                    break
+                pending.append(asyncio.ensure_future(run_io(stage, item)))
+            if not pending:
+                return
+            yield await pending.popleft()
+    finally:
+        for future in pending:
+            future.cancel()
+
+
+def _decode_page(logger, page):
+    try:
+        image_path = resolve_image_path(page["file_id"])
+        resized, _meta = load_page(image_path, logger)
+        page_hash = file_content_hash(image_path)
+    except Exception as exc:
+        logger.exception("[ocr-volume] page_load_failed", extra={"file_id": page["file_id"]})
+        return {"file_id": page["file_id"], "boxes": page["boxes"], "error": str(exc)}
+    return {"file_id": page["file_id"], "boxes": page["boxes"], "resized": resized, "page_hash": page_hash}
+
+
+def prefetch_pages(pages, logger, depth: int = OCR_VOLUME_PREFETCH_PAGES):
+    """
+    Yield {"file_id", "boxes", "resized", "page_hash"} for each {"file_id", "boxes"} in pages,
+    keeping up to `depth` pages decoding ahead on the I/O pool. A page that fails to decode is
+    yielded with an "error" instead of an image.
+    """
+    return _run_ahead(pages, functools.partial(_decode_page, logger), depth)
+
+
+def _lookup_texts(kind: str, keys):
+    """cache_get for a page's worth of keys in one I/O-pool call."""
+    return [cache_get(kind, key) for key in keys]
+
+
+def _store_texts(entries, logger):
+    """cache_put each (kind, key, text) on the I/O pool."""
+    for kind, key, text in entries:
+        cache_put(kind, key, text, logger)
+
+
+def _crop_stage(resized, lang, dedup: bool, logger, item):
+    """
+    Crop extraction, budget, crop hash, dHash and crop-cache lookup for one box (runs on the I/O
+    pool); a crop-cache hit is also written back under the box's page-level content key.
+    """
+    start = time.perf_counter()
+    crop, crop_coords = crop_box(resized, item["box"])
+    item["crop"] = crop
+    if crop is not None:
+        item["crop_coords"] = crop_coords
+        item["budget"] = ocr_max_new_tokens(item["model_id"], crop, item["box_type"])
+        item["pixel_hash"] = crop_pixel_hash(crop)
+        item["crop_key"] = ocr_crop_key(item["pixel_hash"], item["model_id"], lang, item["budget"])
+        item["dhash"] = crop_dhash(crop) if dedup else None
+        item["cached_text"] = cache_get("ocr_crop", item["crop_key"])
+        if item["cached_text"] is not None:
+            cache_put("ocr", item["content_key"], item["cached_text"], logger)
+    item["crop_ms"] = (time.perf_counter() - start) * 1000
+    return item
+
+
+def _timed(fn, *args):
+    """Run fn on the model worker and report when it started and how long it ran."""
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, start, time.perf_counter() - start
+
+
+async def iter_ocr_results(
+    box_list,
+    resized,
+    page_hash,
+    routing_map,
+    lang,
+    event_prefix,
+    logger,
+    stream_tokens: bool = False,
+    cancel_event=None,
+):
+    """
+    Yield one result dict per box. Cached boxes return immediately; duplicate crops (identical
+    pixels, or dHash within a positive OCR_DEDUP_MAX_DISTANCE) are OCR'd once and the text is
+    fanned out to every member box (but never cached under the members' keys); manga-ocr crops
+    are batched (MANGA_OCR_BATCH_SIZE per generate call) and PaddleOCR-VL crops are pooled and
+    generated in buckets of similar size (PADDLE_OCR_BATCH_SIZE per call). With OCR_WORKERS
+    on CPU, batches are sharded across the worker processes. With stream_tokens, in-process
+    generation also yields {"status": "partial"} events carrying the text decoded so far.
+    Setting cancel_event (a threading.Event) stops the loop between boxes, aborts running
+    generations through a stopping criterion and drops queued batches; closing the generator
+    early does the same.
+    """
+    async for result in _iter_pages(
+        _single_page(box_list, resized, page_hash),
+        len(box_list),
+        routing_map,
+        lang,
+        event_prefix,
+        logger,
+        stream_tokens,
+        cancel_event,
+    ):
+        yield result
+
+
+async def iter_volume_ocr_results(
+    pages,
+    routing_map,
+    lang,
+    event_prefix,
+    logger,
+    stream_tokens: bool = False,
+    cancel_event=None,
+):
+    """
+    iter_ocr_results over a whole volume: pages is a list of {"file_id", "boxes"}. Pages are
+    decoded ahead (OCR_VOLUME_PREFETCH_PAGES) while earlier pages run, crops from every page share
+    the same model batches, and each box result carries its file_id plus the volume-wide
+    "processed"/"total" counts and "eta_ms".
+    """
+    total_boxes = sum(len(page["boxes"]) for page in pages)
+    processed = 0
+    started = time.perf_counter()
+    async for result in _iter_pages(
+        prefetch_pages(pages, logger),
+        total_boxes,
+        routing_map,
+        lang,
+        event_prefix,
+        logger,
+        stream_tokens,
+        cancel_event,
+    ):
+        if result.get("status") != "partial":
+            processed += 1
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            result["processed"] = processed
+            result["total"] = total_boxes
+            result["eta_ms"] = int(elapsed_ms / processed * (total_boxes - processed))
+        yield result
+
+
+async def _iter_pages(pages, total_boxes, routing_map, lang, event_prefix, logger, stream_tokens, cancel_event):
+    """Shared loop: routes, caches, dedups and batches the boxes of every page yielded by pages."""
+    cancel_event = cancel_event or threading.Event()
+    device = resolve_ocr_device()
+    pool = ocr_pool_enabled(device)
+    default_model = "manga-ocr" if (lang or "").lower() == "ja" else "paddleocr-vl"
+    processed = 0
+    started = time.perf_counter()
+    manga_jobs = []
+    paddle_jobs = []
+    # Dedup clusters: exact matches by (model_id, pixel_hash); the dHash scan list only in distance mode.
+    exact_clusters = {}
+    near_clusters = []
+    dedup_crops = 0
+    dedup_hits = 0
+    inflight = set()
+    partials = []
+    partial_ready = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    # In-process: one batch generating plus OCR_PREFETCH_BATCHES being preprocessed behind it.
+    max_inflight = ocr_pool_size() * 2 if pool else 1 + OCR_PREFETCH_BATCHES
+    manga_batch_size = MANGA_OCR_BATCH_SIZE
+    if pool:
+        # Smaller batches so one page still spreads over every worker.
+        manga_batch_size = max(1, min(MANGA_OCR_BATCH_SIZE, math.ceil(total_boxes / ocr_pool_size())))
+
+    def progress_fields():
+        elapsed = time.perf_counter() - started
+        avg_ms = (elapsed / processed) * 1000 if processed else 0
+        remaining = max(0, total_boxes - processed)
+        eta_ms = int((avg_ms * remaining)) if processed else 0
+        return {"progress": f"{processed}/{total_boxes}", "eta_ms": eta_ms}
+
+    def member_done(job, text):
+        # The leader's text is not cached under the member's keys: a near-duplicate may read differently.
+        nonlocal processed
+        processed += 1
+        log_event(f"{event_prefix} box_dedup", logger, box_id=job["box_id"], **progress_fields())
+        return _tag({"box_id": job["box_id"], "text": text, "status": "done", "dedup": True}, job["file_id"])
+
+    def box_done(job, text, box_ms):
+        nonlocal processed
+        processed += 1
+        log_event(
+            f"{event_prefix} box_done",
+            logger,
+            box_id=job["box_id"],
+            model=job["model_id"],
+            crop=job["crop_coords"],
+            chars=len(text),
+            crop_size=(job["crop"].width, job["crop"].height),
+            duration_ms=box_ms,
+            **progress_fields(),
+        )
+        results = [_tag({"box_id": job["box_id"], "text": text, "status": "done"}, job["file_id"])]
+        cluster = job.get("cluster")
+        if cluster is not None:
+            cluster["text"] = text
+            results.extend(member_done(member, text) for member in cluster["members"])
+            cluster["members"].clear()
+        return results
+
+    def box_failed(job, exc):
+        cluster = job.get("cluster")
+        members = cluster["members"] if cluster is not None else []
+        results = [
+            _tag({"box_id": j["box_id"], "text": "", "status": "error", "error": str(exc)}, j["file_id"])
+            for j in [job, *members]
+        ]
+        if cluster is not None:
+            exact_clusters.pop((cluster["model_id"], cluster["pixel_hash"]), None)
+            if cluster in near_clusters:
+                near_clusters.remove(cluster)
+        return results
+
+    def push_partial(job, text, delta):
+        cluster = job.get("cluster")
+        members = cluster["members"] if cluster is not None else []
+        for j in [job, *members]:
+            event = _tag({"box_id": j["box_id"], "text": text, "status": "partial"}, j["file_id"])
+            if delta is not None:
+                event["delta"] = delta
+            partials.append(event)
+        partial_ready.set()
+
+    def delta_callback(batch):
+        """Thread-safe on_delta for a batch: hands partial text back to the event loop."""
+        if not stream_tokens or pool:
+            return None
+        return lambda row, text, delta: loop.call_soon_threadsafe(push_partial, batch[row], text, delta)
+
+    async def prepare(model_id, crops):
+        """Processor preprocessing on the I/O pool (None when the model worker has to do it)."""
+        if pool:
+            return None
+        if model_id == "manga-ocr":
+            return await run_io(prepare_manga_ocr_batch, crops, device)
+        return await run_io(prepare_paddleocr_vl_batch, crops, lang)
+
+    async def infer(model_id, crops, budgets, on_delta, prepared):
+        """Returns (texts, model start time, model seconds)."""
+        if pool:
+            start = time.perf_counter()
+            texts = await run_in_ocr_pool(model_id, crops, lang, budgets, logger)
+            return texts, start, time.perf_counter() - start
+        if model_id == "manga-ocr":
+            return await run_model(
+                f"manga-ocr:{device}",
+                _timed,
+                run_manga_ocr_batch,
+                crops,
+                device,
+                logger,
+                budgets,
+                on_delta,
+                cancel_event,
+                prepared,
+            )
+        return await run_model(
+            f"paddleocr-vl:{device}",
+            _timed,
+            run_paddleocr_vl_batch,
+            crops,
+            device,
+            lang,
+            logger,
+            budgets,
+            on_delta,
+            cancel_event,
+            prepared,
+        )
+
+    async def run_batch(batch):
+        batch_start = time.perf_counter()
+        model_id = batch[0]["model_id"]
+        crops = [job["crop"] for job in batch]
+        try:
+            prepared = await prepare(model_id, crops)
+            prepared_at = time.perf_counter()
+            texts, model_start, model_s = await infer(
+                model_id,
+                crops,
+                [job["budget"] for job in batch],
+                delta_callback(batch),
+                prepared,
+            )
+        except Exception as exc:
+            if cancel_event.is_set():
+                return []
+            logger.exception(f"{event_prefix} batch_failed", extra={"box_ids": [job["box_id"] for job in batch]})
+            return [result for job in batch for result in box_failed(job, exc)]
+        if cancel_event.is_set():
+            # Generation was cut short: never report or cache truncated text.
+            return []
+        box_ms = int((time.perf_counter() - batch_start) * 1000 / len(batch))
+        log_event(
+            f"{event_prefix} batch_stages",
+            logger,
+            model=model_id,
+            batch=len(batch),
+            crop_ms=int(sum(job["crop_ms"] for job in batch)),
+            preprocess_ms=int((prepared_at - batch_start) * 1000) if prepared is not None else None,
+            queue_ms=int((model_start - prepared_at) * 1000),
+            model_ms=int(model_s * 1000),
+        )
+        await run_io(
+            _store_texts,
+            [
+                entry
+                for job, text in zip(batch, texts)
+                for entry in (("ocr", job["content_key"], text), ("ocr_crop", job["crop_key"], text))
+            ],
+            logger,
+        )
+        return [result for job, text in zip(batch, texts) for result in box_done(job, text, box_ms)]
+
+    def submit(batch):
+        inflight.add(asyncio.ensure_future(run_batch(batch)))
+
+    def flush_manga():
+        submit(manga_jobs[:])
+        manga_jobs.clear()
+
+    def flush_paddle():
+        pending = paddle_jobs[:]
+        paddle_jobs.clear()
+        for bucket in bucket_paddle_crops(
+            [job["crop"] for job in pending], get_paddle_processor(), [job["budget"] for job in pending]
+        ):
+            submit([pending[idx] for idx in bucket])
+
+    async def drain(limit):
+        """Yield partial text and finished batches, waiting while more than `limit` are in flight."""
+        while True:
+            while partials:
+                yield partials.pop(0)
+            finished = [task for task in inflight if task.done()]
+            for task in finished:
+                inflight.discard(task)
+                for result in task.result():
+                    yield result
+            if finished:
+                continue
+            if len(inflight) <= limit or cancel_event.is_set():
+                return
+            waiter = asyncio.ensure_future(partial_ready.wait())
+            # The timeout lets a cancel_event set from outside the loop interrupt the wait.
+            await asyncio.wait(inflight | {waiter}, timeout=0.25, return_when=asyncio.FIRST_COMPLETED)
+            waiter.cancel()
+            partial_ready.clear()
+
+    completed = False
+    try:
+        async for page in pages:
+            if cancel_event.is_set():
+                break
+            file_id = page["file_id"]
+            if page.get("error") is not None:
+                for b in page["boxes"]:
+                    processed += 1
+                    yield _tag(
+                        {"box_id": b.get("id"), "text": "", "status": "error", "error": "page_load_failed"}, file_id
+                    )
+                continue
+            resized, page_hash = page["resized"], page["page_hash"]
+            staged = []
+            routed = []
+            for b in page["boxes"]:
+                box_type = b.get("type")
+                model_id = routing_map.get(box_type)
+                if not model_id:
+                    model_id = "paddleocr-vl" if box_type == "sounds" else default_model
+                routed.append((b, box_type, model_id, ocr_content_key(page_hash, model_id, lang, b)))
+            page_cached = await run_io(_lookup_texts, "ocr", [content_key for *_, content_key in routed])
+            for (b, box_type, model_id, content_key), cached_text in zip(routed, page_cached):
+                box_id = b.get("id") or uuid.uuid4().hex
+                if cached_text is not None:
+                    processed += 1
+                    log_event(
+                        f"{event_prefix} box_cached",
+                        logger,
+                        box_id=box_id,
+                        source="page",
+                        progress=f"{processed}/{total_boxes}",
+                    )
+                    yield _tag({"box_id": box_id, "text": cached_text, "status": "done", "cached": True}, file_id)
+                    continue
+                staged.append(
+                    {"box": b, "box_id": box_id, "box_type": box_type, "model_id": model_id, "content_key": content_key}
+                )
+            stage = functools.partial(_crop_stage, resized, lang, OCR_DEDUP_MAX_DISTANCE > 0, logger)
+            async with aclosing(_run_ahead(staged, stage, OCR_PREFETCH_BOXES)) as cropped:
+                async for item in cropped:
+                    if cancel_event.is_set():
+                        break
+                    box_id, model_id, crop = item["box_id"], item["model_id"], item["crop"]
+                    if crop is None:
+                        log_event(f"{event_prefix} invalid_box", logger, box_id=box_id, box=item["box"])
+                        yield _tag({"box_id": box_id, "text": "", "status": "error", "error": "invalid_box"}, file_id)
+                        continue
+                    cached_text = item["cached_text"]
+                    if cached_text is not None:
+                        processed += 1
+                        log_event(
+                            f"{event_prefix} box_cached",
+                            logger,
+                            box_id=box_id,
+                            source="crop",
+                            progress=f"{processed}/{total_boxes}",
+                        )
+                        yield _tag(
+                            {"box_id": box_id, "text": cached_text, "status": "done", "cached": True}, file_id
+                        )
+                        continue
+                    if model_id not in OCR_MODELS:
+                        yield _tag({"box_id": box_id, "text": "", "status": "done"}, file_id)
+                        continue
+                    job = {
+                        "file_id": file_id,
+                        "box_id": box_id,
+                        "model_id": model_id,
+                        "crop": crop,
+                        "crop_coords": item["crop_coords"],
+                        "crop_ms": item["crop_ms"],
+                        "budget": item["budget"],
+                        "content_key": item["content_key"],
+                        "crop_key": item["crop_key"],
+                    }
+
+                    if OCR_DEDUP_MAX_DISTANCE >= 0:
+                        dedup_crops += 1
+                        dhash, pixel_hash = item["dhash"], item["pixel_hash"]
+                        cluster = exact_clusters.get((model_id, pixel_hash))
+                        if cluster is None and OCR_DEDUP_MAX_DISTANCE > 0:
+                            cluster = next(
+                                (
+                                    c
+                                    for c in near_clusters
+                                    if c["model_id"] == model_id
+                                    and (c["dhash"] ^ dhash).bit_count() <= OCR_DEDUP_MAX_DISTANCE
+                                    and _same_shape(c["crop"], crop)
+                                ),
+                                None,
+                            )
+                        if cluster is not None:
+                            dedup_hits += 1
+                            if cluster["text"] is not None:
+                                yield member_done(job, cluster["text"])
+                            else:
+                                cluster["members"].append(job)
+                            continue
+                        job["cluster"] = {
+                            "model_id": model_id,
+                            "dhash": dhash,
+                            "pixel_hash": pixel_hash,
+                            "crop": crop,
+                            "text": None,
+                            "members": [],
+                        }
+                        exact_clusters[(model_id, pixel_hash)] = job["cluster"]
+                        if OCR_DEDUP_MAX_DISTANCE > 0:
+                            near_clusters.append(job["cluster"])
+
+                    if model_id == "manga-ocr":
+                        manga_jobs.append(job)
+                        if len(manga_jobs) >= manga_batch_size:
+                            flush_manga()
+                    # In the worker pool PaddleOCR-VL crops go out one per task: parallel processes beat
+                    # padded batches on CPU.
+                    elif PADDLE_OCR_BATCH_SIZE > 1 and not pool:
+                        paddle_jobs.append(job)
+                        if len(paddle_jobs) >= PADDLE_OCR_BATCH_SIZE * 4:
+                            flush_paddle()
+                    else:
+                        submit([job])
+                    async for result in drain(max_inflight):
+                        yield result
+        if not cancel_event.is_set():
+            if manga_jobs:
+                flush_manga()
+            if paddle_jobs:
+                flush_paddle()
+            async for result in drain(0):
+                yield result
+            completed = not cancel_event.is_set()
+        if dedup_crops:
+            log_event(
+                f"{event_prefix} dedup",
+                logger,
+                crops=dedup_crops,
+                unique=dedup_crops - dedup_hits,
+                duplicates=dedup_hits,
+                ratio=round(dedup_hits / dedup_crops, 4),
+            )
+    finally:
+        await pages.aclose()
+        if not completed:
+            cancel_event.set()
+            for task in inflight:
+                task.cancel()
+            log_event(
+                f"{event_prefix} cancelled",
+                logger,
+                processed=processed,
+                total=total_boxes,
+                dropped_batches=len(inflight),
+            )
@@ -0,0 +1,122 @@
+"""
+Multi-process CPU OCR worker pool.
+Each worker process loads its own manga-ocr / PaddleOCR-VL instance on first use, runs with a
+pinned torch thread count (OCR_WORKER_THREADS) and optionally its own block of cores
+(OCR_WORKER_AFFINITY), so a page's crops are OCR'd on several cores in parallel instead of by one
+autoregressive decoder that stops scaling after a few threads.
+"""
+import asyncio
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import List, Optional
+
+from config import OCR_WORKER_AFFINITY, OCR_WORKER_THREADS, OCR_WORKERS
+from logging_config import log_event
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+_worker_logger: Optional[logging.Logger] = None
+
+
+def ocr_pool_size() -> int:
+    return OCR_WORKERS
+
+
+def ocr_pool_enabled(device) -> bool:
+    """The pool only serves CPU inference; GPU/MPS keep the single in-process model worker."""
+    return OCR_WORKERS > 0 and getattr(device, "type", str(device)) == "cpu"
+
+
+def _init_worker(counter, threads: int, affinity: bool):
+    """Process initializer: pin torch threads and (optionally) a dedicated block of cores."""
+    global _worker_logger
+    with counter.get_lock():
+        index = counter.value
+        counter.value += 1
+    os.environ["OMP_NUM_THREADS"] = str(threads)
+    os.environ["MKL_NUM_THREADS"] = str(threads)
+    cores = None
+    if affinity and hasattr(os, "sched_setaffinity"):
+        available = sorted(os.sched_getaffinity(0))
+        cores = [available[(index * threads + i) % len(available)] for i in range(threads)]
+        try:
+            os.sched_setaffinity(0, cores)
+        except OSError:
+            cores = None
+
+    logger = logging.getLogger(f"ocr_backend.worker{index}")
+    if not logger.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(
+            logging.Formatter(f"%(asctime)s [%(levelname)s] [worker{index}] %(message)s", datefmt="%Y-%m-%d %H:%M:%S")
+        )
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+    _worker_logger = logger
+    from utils.device import configure_torch_threads
+
+    configure_torch_threads(logger, threads, 1)
+    log_event("[ocr-worker] started", logger, index=index, pid=os.getpid(), threads=threads, cores=cores)
+
+
+def _worker_run(model_id: str, crops, lang: Optional[str], budgets) -> List[str]:
+    """Runs inside a worker process: OCR one batch of crops with the worker's own model."""
+    import torch
+
+    from services.ocr import run_manga_ocr_batch, run_paddleocr_vl_batch
+
+    device = torch.device("cpu")
+    if model_id == "manga-ocr":
+        return run_manga_ocr_batch(crops, device, _worker_logger, budgets)
+    return run_paddleocr_vl_batch(crops, device, lang, _worker_logger, budgets)
+
+
+def _get_pool(logger) -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            ctx = multiprocessing.get_context("spawn")
+            _pool = ProcessPoolExecutor(
+                max_workers=OCR_WORKERS,
+                mp_context=ctx,
+                initializer=_init_worker,
+                initargs=(ctx.Value("i", 0), OCR_WORKER_THREADS, OCR_WORKER_AFFINITY),
+            )
+            log_event(
+                "[ocr-pool] created",
+                logger,
+                workers=OCR_WORKERS,
+                threads_per_worker=OCR_WORKER_THREADS,
+                affinity=OCR_WORKER_AFFINITY,
+            )
+        return _pool
+
+
+async def run_in_ocr_pool(model_id: str, crops, lang: Optional[str], budgets, logger) -> List[str]:
+    """OCR a batch of crops on the next free worker process."""
+    global _pool
+    pool = _get_pool(logger)
+    loop = asyncio.get_running_loop()
+    try:
+        return await loop.run_in_executor(pool, _worker_run, model_id, crops, lang, budgets)
+    except BrokenProcessPool:
+        log_event("[ocr-pool] broken", logger, model=model_id)
+        with _pool_lock:
+            if _pool is pool:
+                _pool = None
+        pool.shutdown(wait=False, cancel_futures=True)
+        raise
+
+
+def shutdown_ocr_pool():
+    """Stop the worker processes (called on app shutdown)."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
@@ -0,0 +1,143 @@
+"""
+Content-addressed result cache.
+Detection candidates and per-box OCR results are stored under cache/results, keyed by the sha256
+of the page bytes plus the model id and parameters, so re-uploads reuse prior work across sessions.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+from config import RESULT_CACHE_DIR, RESULT_CACHE_MAX_MB
+from logging_config import log_event
+
+_lock = threading.Lock()
+_hash_memo: Dict[Tuple[str, int, int], str] = {}
+# LRU index of entry path -> size (oldest first) and its running total, built by one directory
+# scan on first use and kept up to date by cache_get / cache_put / eviction.
+_index: Optional["OrderedDict[Path, int]"] = None
+_total_bytes: Optional[int] = None
+_stats = {"hits": {}, "misses": {}, "writes": 0, "evictions": 0}
+
+
+def file_content_hash(path: Path) -> str:
+    """sha256 of file bytes, memoized by (path, size, mtime)."""
+    stat = path.stat()
+    memo_key = (str(path), stat.st_size, stat.st_mtime_ns)
+    cached = _hash_memo.get(memo_key)
+    if cached is not None:
+        return cached
+    digest = hashlib.sha256()
+    with path.open("rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    value = digest.hexdigest()
+    _hash_memo[memo_key] = value
+    return value
+
+
+def _entry_path(kind: str, key_parts: dict) -> Path:
+    raw = json.dumps({"kind": kind, **key_parts}, sort_keys=True, ensure_ascii=True, default=str)
+    key = hashlib.sha256(raw.encode("utf-8")).hexdigest()
+    return RESULT_CACHE_DIR / kind / key[:2] / f"{key}.json"
+
+
+def _ensure_index_locked():
+    """Scan the cache directory once, ordering entries by mtime (least recently used first)."""
+    global _index, _total_bytes
+    if _index is not None:
+        return
+    entries = []
+    if RESULT_CACHE_DIR.exists():
+        for p in RESULT_CACHE_DIR.rglob("*.json"):
+            try:
+                stat = p.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, p))
+    entries.sort(key=lambda e: e[0])
+    _index = OrderedDict((p, size) for _mtime, size, p in entries)
+    _total_bytes = sum(_index.values())
+
+
+def _evict_locked(logger):
+    """Delete least-recently-used entries until the cache is under 90% of its budget."""
+    global _total_bytes
+    budget = int(RESULT_CACHE_MAX_MB * 1024 * 1024)
+    if _total_bytes <= budget:
+        return
+    target = int(budget * 0.9)
+    removed = 0
+    while _index and _total_bytes > target:
+        p, size = _index.popitem(last=False)
+        _total_bytes -= size
+        try:
+            p.unlink()
+        except OSError:
+            continue
+        removed += 1
+    _stats["evictions"] += removed
+    log_event("[result-cache] evicted", logger, removed=removed, total_bytes=_total_bytes, budget_bytes=budget)
+
+
+def cache_get(kind: str, key_parts: dict) -> Optional[Any]:
+    """Return cached value for (kind, key_parts) or None. A hit refreshes the entry's LRU position."""
+    path = _entry_path(kind, key_parts)
+    value = None
+    try:
+        value = json.loads(path.read_text())["value"]
+        os.utime(path, None)
+    except (OSError, ValueError, KeyError):
+        value = None
+    with _lock:
+        if value is not None and _index is not None and path in _index:
+            _index.move_to_end(path)
+        bucket = _stats["hits"] if value is not None else _stats["misses"]
+        bucket[kind] = bucket.get(kind, 0) + 1
+    return value
+
+
+def cache_put(kind: str, key_parts: dict, value: Any, logger):
+    """Store value for (kind, key_parts) and enforce the on-disk size budget."""
+    global _total_bytes
+    path = _entry_path(kind, key_parts)
+    payload = json.dumps({"saved_at": time.time(), "key": key_parts, "value": value}, ensure_ascii=True)
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(f".{threading.get_ident()}.tmp")
+        tmp_path.write_text(payload)
+        os.replace(tmp_path, path)
+    except OSError:
+        logger.exception("[result-cache] write_failed", extra={"kind": kind})
+        return
+    with _lock:
+        _ensure_index_locked()
+        size = len(payload)
+        _total_bytes += size - _index.pop(path, 0)
+        _index[path] = size
+        _stats["writes"] += 1
+        _evict_locked(logger)
+
+
+def cache_stats() -> dict:
+    """Hit/miss counters per kind plus current on-disk usage."""
+    with _lock:
+        _ensure_index_locked()
+        hits = dict(_stats["hits"])
+        misses = dict(_stats["misses"])
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": {
+                kind: round(hits.get(kind, 0) / (hits.get(kind, 0) + misses.get(kind, 0)), 4)
+                for kind in set(hits) | set(misses)
+            },
+            "writes": _stats["writes"],
+            "evictions": _stats["evictions"],
+            "size_bytes": _total_bytes,
+            "budget_bytes": int(RESULT_CACHE_MAX_MB * 1024 * 1024),
+        }
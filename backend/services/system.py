@@ -1,6 +1,7 @@
 """
 System information service.
 """
+import os
 import platform
 import subprocess
 
@@ -18,3 +19,76 @@ def get_cpu_name() -> str:
             pass
     return platform.processor() or platform.machine() or "Unknown CPU"
 
+
+def get_physical_cores():
+    """Physical core count, or None when it cannot be determined."""
+    system = platform.system()
+    if system == "Darwin":
+        try:
+            return int(subprocess.check_output(["sysctl", "-n", "hw.physicalcpu"]).decode().strip())
+        except Exception:
+            return None
+    if system == "Linux":
+        try:
+            cores = set()
+            physical_id = core_id = None
+            with open("/proc/cpuinfo", encoding="utf-8") as f:
+                for line in f:
+                    key, _, value = line.partition(":")
+                    key = key.strip()
+                    if key == "physical id":
+                        physical_id = value.strip()
+                    elif key == "core id":
+                        core_id = value.strip()
+                    elif not key and core_id is not None:
+                        cores.add((physical_id, core_id))
+                        physical_id = core_id = None
+            if core_id is not None:
+                cores.add((physical_id, core_id))
+            return len(cores) or None
+        except OSError:
+            return None
+    return None
+
+
+def get_total_ram_bytes():
+    """Total physical memory in bytes, or None when it cannot be determined."""
+    if platform.system() == "Windows":
+        try:
+            import ctypes
+
+            class _MemoryStatus(ctypes.Structure):
+                _fields_ = [
+                    ("dwLength", ctypes.c_ulong),
+                    ("dwMemoryLoad", ctypes.c_ulong),
+                    ("ullTotalPhys", ctypes.c_ulonglong),
+                    ("ullAvailPhys", ctypes.c_ulonglong),
+                    ("ullTotalPageFile", ctypes.c_ulonglong),
+                    ("ullAvailPageFile", ctypes.c_ulonglong),
+                    ("ullTotalVirtual", ctypes.c_ulonglong),
+                    ("ullAvailVirtual", ctypes.c_ulonglong),
+                    ("sullAvailExtendedVirtual", ctypes.c_ulonglong),
+                ]
+
+            status = _MemoryStatus()
+            status.dwLength = ctypes.sizeof(_MemoryStatus)
+            ctypes.windll.kernel32.GlobalMemoryStatusEx(ctypes.byref(status))
+            return int(status.ullTotalPhys)
+        except Exception:
+            return None
+    try:
+        return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+    except (AttributeError, OSError, ValueError):
+        return None
+
+
+def probe_hardware() -> dict:
+    """CPU name, logical/physical/usable cores and total RAM."""
+    usable = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count()
+    return {
+        "cpu": get_cpu_name(),
+        "logical_cores": os.cpu_count(),
+        "physical_cores": get_physical_cores(),
+        "usable_cores": usable,
+        "ram_bytes": get_total_ram_bytes(),
+    }
@@ -0,0 +1,125 @@
+"""
+Background model preload and warmup.
+Models listed in PRELOAD_MODELS are loaded one after another on their own model workers at
+startup and run one dummy inference, so the first real request does not pay for from_pretrained
+or first-call kernel setup. With the CPU OCR worker pool (OCR_WORKERS) the OCR models are warmed
+inside the worker processes instead, never in the parent. Readiness combines the registry's load
+state with the warmup state.
+"""
+import asyncio
+import time
+
+from PIL import Image
+
+from config import PRELOAD_MODELS
+from logging_config import log_event
+from models import registry
+from services.executor import run_io, run_model
+from services.ocr_workers import ocr_pool_enabled, ocr_pool_size, run_in_ocr_pool
+
+MODEL_NAMES = ("detector", "manga-ocr", "paddleocr-vl")
+
+_warmup = {}
+
+
+def _resolve_device():
+    from utils.device import resolve_ocr_device
+
+    return resolve_ocr_device()
+
+
+def _warm_detector(device, logger):
+    import torch
+
+    from models.detector import load_detector
+
+    model, processor = load_detector(logger)
+    inputs = processor(images=Image.new("RGB", (640, 640), "white"), return_tensors="pt")
+    inputs = {k: v.to(model.device) for k, v in inputs.items()}
+    with torch.no_grad():
+        model(**inputs)
+
+
+def _warm_manga_ocr(device, logger):
+    from services.ocr import run_manga_ocr
+
+    run_manga_ocr(Image.new("RGB", (48, 96), "white"), device, logger)
+
+
+def _warm_paddleocr_vl(device, logger):
+    from services.ocr import run_paddleocr_vl
+
+    run_paddleocr_vl(Image.new("RGB", (96, 96), "white"), device, "ja", logger)
+
+
+async def _warm_ocr_pool(name, logger):
+    """One dummy crop per worker, submitted together so each worker process loads its own copy."""
+    crop = Image.new("RGB", (48, 96) if name == "manga-ocr" else (96, 96), "white")
+    await asyncio.gather(*(run_in_ocr_pool(name, [crop], "ja", None, logger) for _ in range(ocr_pool_size())))
+
+
+_WARMERS = {
+    "detector": _warm_detector,
+    "manga-ocr": _warm_manga_ocr,
+    "paddleocr-vl": _warm_paddleocr_vl,
+}
+
+
+async def preload_models(logger, models=None):
+    """Load and warm each requested model sequentially (so the weight budget applies in order)."""
+    models = PRELOAD_MODELS if models is None else models
+    unknown = [name for name in models if name not in _WARMERS]
+    if unknown:
+        log_event("[warmup] unknown_models", logger, models=unknown)
+    models = [name for name in models if name in _WARMERS]
+    if not models:
+        return
+    for name in models:
+        _warmup[name] = {"state": "pending", "warmup_ms": None, "error": None}
+    device = await run_io(_resolve_device)
+    pool = ocr_pool_enabled(device)
+    for name in models:
+        _warmup[name]["state"] = "running"
+        in_pool = pool and name != "detector"
+        _warmup[name]["workers"] = in_pool
+        model_key = "detector" if name == "detector" else f"{name}:{device}"
+        start = time.perf_counter()
+        log_event("[warmup] start", logger, model=name, device=str(device), workers=in_pool)
+        try:
+            if in_pool:
+                await _warm_ocr_pool(name, logger)
+            else:
+                await run_model(model_key, _WARMERS[name], device, logger)
+        except Exception as exc:
+            logger.exception("[warmup] failed", extra={"model": name})
+            _warmup[name].update(state="failed", error=str(exc))
+            continue
+        warmup_ms = int((time.perf_counter() - start) * 1000)
+        _warmup[name].update(state="done", warmup_ms=warmup_ms)
+        log_event("[warmup] done", logger, model=name, duration_ms=warmup_ms)
+
+
+def readiness() -> dict:
+    """Per-model state (unloaded, loading, warm) with load/warmup durations."""
+    models = registry.residency()["models"]
+    report = {}
+    for name in MODEL_NAMES:
+        entry = models.get(name, {})
+        warmup = _warmup.get(name, {})
+        state = entry.get("state", "unloaded")
+        if warmup.get("state") in {"pending", "running"}:
+            state = "loading"
+        elif state == "loaded" or (warmup.get("workers") and warmup.get("state") == "done"):
+            # Pool-warmed models live in the worker processes, not in the parent's registry.
+            state = "warm"
+        report[name] = {
+            "state": state,
+            "load_ms": entry.get("load_ms"),
+            "warmup_ms": warmup.get("warmup_ms"),
+            "preload": name in _warmup,
+            "error": warmup.get("error"),
+        }
+    return {
+        "ready": not any(w["state"] in {"pending", "running"} for w in _warmup.values()),
+        "models": report,
+    }
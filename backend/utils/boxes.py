@@ -3,33 +3,15 @@ Box manipulation utilities.
 """
 import json
 import time
-import uuid
 from pathlib import Path
 from typing import List, Optional
 
+import numpy as np
+
 from config import TMP_DIR
 from logging_config import log_event
 
 
-def normalize_boxes(boxes_px: List[dict], size: tuple[int, int]) -> List[dict]:
-    """Convert pixel boxes to normalized [0,1] coords. Expects boxes with x,y,w,h in pixels."""
-    w, h = size
-    normed = []
-    for b in boxes_px:
-        normed.append(
-            {
-                "id": b.get("id") or uuid.uuid4().hex,
-                "type": b.get("type"),
-                "score": b.get("score"),
-                "x": b["x"] / w,
-                "y": b["y"] / h,
-                "w": b["w"] / w,
-                "h": b["h"] / h,
-            }
-        )
-    return normed
-
-
 def boxes_cache_path(file_id: str) -> Path:
     """Get path for boxes cache file."""
     return TMP_DIR / f"{file_id}.boxes.json"
@@ -56,6 +38,51 @@ def save_boxes_cache(file_id: str, boxes: List[dict], logger, meta: Optional[dic
     log_event("[detect] cache_saved", logger, file_id=file_id, path=str(path), count=len(boxes))
 
 
+def candidates_cache_path(file_id: str) -> Path:
+    """Get path for raw detector candidates cache file."""
+    return TMP_DIR / f"{file_id}.candidates.json"
+
+
+def save_candidates_cache(file_id: str, candidates: dict, meta: Optional[dict], detector: str, logger):
+    """
+    Save raw scored detector candidates (threshold=0.001 post-process output, pixel xyxy on the
+    resized page) so threshold/max_boxes changes can be re-filtered without re-inference.
+    """
+    payload = {
+        "file_id": file_id,
+        "saved_at": time.time(),
+        "detector": detector,
+        "meta": meta,
+        "scores": candidates["scores"],
+        "labels": candidates["labels"],
+        "boxes": candidates["boxes"],
+    }
+    path = candidates_cache_path(file_id)
+    path.write_text(json.dumps(payload, ensure_ascii=True))
+    log_event(
+        "[detect] candidates_saved",
+        logger,
+        file_id=file_id,
+        path=str(path),
+        count=len(candidates["scores"]),
+        detector=detector,
+    )
+
+
+def load_candidates_cache(file_id: str, detector: str) -> Optional[dict]:
+    """Load cached detector candidates; returns None when missing, unreadable or from other weights."""
+    path = candidates_cache_path(file_id)
+    if not path.exists():
+        return None
+    try:
+        data = json.loads(path.read_text())
+    except Exception:
+        return None
+    if data.get("detector") != detector or not data.get("meta"):
+        return None
+    return data
+
+
 def boxes_overlap(a: dict, b: dict) -> bool:
     """Check if two boxes overlap."""
     ax1, ay1 = a["x"], a["y"]
@@ -80,3 +107,39 @@ def suppress_overlaps(boxes: List[dict], max_boxes: int) -> List[dict]:
             break
     return kept
 
+
+def suppress_overlaps_array(
+    boxes: np.ndarray,
+    scores: np.ndarray,
+    max_boxes: int,
+    iou_threshold: Optional[float] = None,
+) -> np.ndarray:
+    """
+    Greedy overlap suppression over an (N, 4) array of x, y, w, h boxes.
+    iou_threshold=None keeps the strict rule of suppress_overlaps (any intersection suppresses);
+    otherwise boxes whose IoU with a kept box exceeds iou_threshold are suppressed (classic NMS).
+    Returns indices of kept boxes, highest score first, stopping once max_boxes are kept.
+    """
+    boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+    if boxes.shape[0] == 0 or max_boxes <= 0:
+        return np.empty(0, dtype=np.int64)
+    x1, y1 = boxes[:, 0], boxes[:, 1]
+    x2, y2 = x1 + boxes[:, 2], y1 + boxes[:, 3]
+    areas = boxes[:, 2] * boxes[:, 3]
+    order = np.argsort(-np.asarray(scores, dtype=np.float64), kind="stable")
+    kept = []
+    while order.size:
+        i = order[0]
+        kept.append(i)
+        if len(kept) >= max_boxes:
+            break
+        rest = order[1:]
+        inter_w = np.maximum(0.0, np.minimum(x2[i], x2[rest]) - np.maximum(x1[i], x1[rest]))
+        inter_h = np.maximum(0.0, np.minimum(y2[i], y2[rest]) - np.maximum(y1[i], y1[rest]))
+        if iou_threshold is None:
+            overlap = (inter_w > 0) & (inter_h > 0)
+        else:
+            inter = inter_w * inter_h
+            overlap = inter > iou_threshold * (areas[i] + areas[rest] - inter)
+        order = rest[~overlap]
+    return np.asarray(kept, dtype=np.int64)
@@ -1,14 +1,40 @@
 """
 Device management utilities for PyTorch.
 """
+import functools
 import os
 import platform
 from typing import Optional
 
 import torch
 
+from config import PADDLE_OCR_CPU_PRECISION, TORCH_INTEROP_THREADS, TORCH_THREADS
 from logging_config import log_event
 
+_threads_configured = False
+
+
+def configure_torch_threads(logger, threads: int = TORCH_THREADS, interop_threads: int = TORCH_INTEROP_THREADS):
+    """Apply torch thread counts once per process (before the first model loads); 0 keeps the default."""
+    global _threads_configured
+    if _threads_configured:
+        return
+    _threads_configured = True
+    if threads:
+        torch.set_num_threads(threads)
+    if interop_threads:
+        try:
+            torch.set_num_interop_threads(interop_threads)
+        except RuntimeError:
+            # Inter-op pool already started; the setting only applies before first parallel work.
+            pass
+    log_event(
+        "[device] torch_threads",
+        logger,
+        threads=torch.get_num_threads(),
+        interop_threads=torch.get_num_interop_threads(),
+    )
+
 
 def resolve_ocr_device() -> torch.device:
     """Resolve device for OCR models."""
@@ -61,9 +87,26 @@ def resolve_paddle_device(requested: torch.device, logger) -> torch.device:
     return requested
 
 
+@functools.lru_cache(maxsize=None)
+def cpu_bf16_supported() -> bool:
+    """Whether the CPU runs bf16 matmuls natively (AVX512-BF16 / AMX) rather than emulated."""
+    try:
+        with open("/proc/cpuinfo", encoding="utf-8") as f:
+            flags = f.read()
+        return "avx512_bf16" in flags or "amx_bf16" in flags
+    except OSError:
+        pass
+    try:
+        return bool(torch.ops.mkldnn._is_mkldnn_bf16_supported())
+    except Exception:
+        return False
+
+
 def paddleocr_default_dtype(device: torch.device) -> torch.dtype:
-    """Get default dtype for PaddleOCR-VL based on device."""
+    """Get default dtype for PaddleOCR-VL based on device (bf16 on CPU only when opted in and native)."""
     if device.type in {"cuda", "mps"}:
         return torch.float16
+    if PADDLE_OCR_CPU_PRECISION == "bf16" and cpu_bf16_supported():
+        return torch.bfloat16
     return torch.float32
 
@@ -1,15 +1,24 @@
 """
 Image processing utilities.
 """
+import hashlib
+import threading
+from collections import OrderedDict
 from pathlib import Path
 from typing import Optional, Tuple
 
 from fastapi import HTTPException
 from PIL import Image
 
-from config import IMAGE_EXTENSIONS, OCR_CROP_PAD_RATIO, TMP_DIR
+from config import IMAGE_EXTENSIONS, OCR_CROP_PAD_RATIO, PAGE_CACHE_MAX_MB, TMP_DIR
 from logging_config import log_event
 
+# Process-wide LRU of resized pages: (path, mtime_ns, max_side) -> (image, meta, nbytes)
+_page_cache: "OrderedDict[tuple, tuple]" = OrderedDict()
+_page_cache_lock = threading.Lock()
+_page_cache_bytes = 0
+_page_cache_stats = {"hits": 0, "misses": 0, "evictions": 0}
+
 
 def ensure_image(path: Path, logger) -> Image.Image:
     """Open and convert image to RGB."""
@@ -61,6 +70,54 @@ def resize_for_model(img: Image.Image, max_side: int = 1280) -> Tuple[Image.Imag
     return img, {"orig_size": (w, h), "resized_size": (new_w, new_h), "scale": scale}
 
 
+def load_page(path: Path, logger, max_side: int = 1280) -> Tuple[Image.Image, dict]:
+    """
+    ensure_image + resize_for_model through the shared page cache.
+    The returned image is shared between callers and must not be modified in place.
+    """
+    global _page_cache_bytes
+    try:
+        mtime_ns = path.stat().st_mtime_ns
+    except OSError:
+        mtime_ns = None
+    key = (str(path), mtime_ns, max_side)
+    with _page_cache_lock:
+        entry = _page_cache.get(key)
+        if entry is not None:
+            _page_cache.move_to_end(key)
+            _page_cache_stats["hits"] += 1
+            return entry[0], dict(entry[1])
+        _page_cache_stats["misses"] += 1
+
+    resized, meta = resize_for_model(ensure_image(path, logger), max_side)
+    nbytes = resized.width * resized.height * len(resized.getbands())
+    budget = int(PAGE_CACHE_MAX_MB * 1024 * 1024)
+    if mtime_ns is None or nbytes > budget:
+        return resized, meta
+    with _page_cache_lock:
+        if key not in _page_cache:
+            _page_cache[key] = (resized, dict(meta), nbytes)
+            _page_cache_bytes += nbytes
+        while _page_cache_bytes > budget and _page_cache:
+            _, (_, _, evicted_bytes) = _page_cache.popitem(last=False)
+            _page_cache_bytes -= evicted_bytes
+            _page_cache_stats["evictions"] += 1
+    return resized, meta
+
+
+def page_cache_stats() -> dict:
+    """Hit/miss/eviction counters and memory usage of the decoded-page cache."""
+    with _page_cache_lock:
+        lookups = _page_cache_stats["hits"] + _page_cache_stats["misses"]
+        return {
+            **_page_cache_stats,
+            "hit_rate": round(_page_cache_stats["hits"] / lookups, 4) if lookups else 0.0,
+            "entries": len(_page_cache),
+            "size_bytes": _page_cache_bytes,
+            "budget_bytes": int(PAGE_CACHE_MAX_MB * 1024 * 1024),
+        }
+
+
 def denormalize_box(box: dict, size: Tuple[int, int]) -> Tuple[int, int, int, int]:
     """Convert normalized box coordinates to pixel coordinates."""
     width, height = size
@@ -82,6 +139,26 @@ def denormalize_box(box: dict, size: Tuple[int, int]) -> Tuple[int, int, int, in
     return x1, y1, x2, y2
 
 
+def crop_pixel_hash(crop: Image.Image) -> str:
+    """Fast content hash of a crop's pixels (blake2b over size, mode and raw bytes)."""
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(f"{crop.mode}:{crop.width}x{crop.height}".encode("ascii"))
+    digest.update(crop.tobytes())
+    return digest.hexdigest()
+
+
+def crop_dhash(crop: Image.Image, hash_size: int = 8) -> int:
+    """Perceptual difference hash: downscaled grayscale, one bit per horizontal gradient."""
+    small = crop.convert("L").resize((hash_size + 1, hash_size), Image.BILINEAR)
+    pixels = list(small.getdata())
+    bits = 0
+    for row in range(hash_size):
+        offset = row * (hash_size + 1)
+        for col in range(hash_size):
+            bits = (bits << 1) | int(pixels[offset + col] > pixels[offset + col + 1])
+    return bits
+
+
 def crop_box(
     img: Image.Image, box: dict, pad_ratio: float = OCR_CROP_PAD_RATIO
 ) -> Tuple[Optional[Image.Image], Optional[Tuple[int, int, int, int]]]:
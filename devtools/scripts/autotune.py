@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+"""
+CPU inference autotuner.
+Probes the hardware, benchmarks the detector, manga-ocr and PaddleOCR-VL over a grid of torch
+thread counts and batch sizes (plus OCR worker-process counts), and writes a tuned profile
+(cache/tuned_profile.json by default) whose settings the backend uses as defaults at startup.
+Uses pages/crops from --input-dir (images + *.boxes.json, e.g. tmp/) or synthetic samples.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import math
+import os
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+from bench_pages import synthetic_page
+
+MODELS = ("detector", "manga-ocr", "paddleocr-vl")
+
+
+def _ensure_backend_on_path():
+    backend_dir = Path(__file__).resolve().parents[2] / "backend"
+    if str(backend_dir) not in sys.path:
+        sys.path.insert(0, str(backend_dir))
+
+
+def _int_list(raw: str):
+    return [int(v) for v in raw.split(",") if v.strip()]
+
+
+def _thread_grid(cores: int):
+    grid = []
+    threads = 1
+    while threads < cores:
+        grid.append(threads)
+        threads *= 2
+    grid.append(cores)
+    return grid
+
+
+def _synthetic_crop(rng) -> Image.Image:
+    width, height = int(rng.integers(40, 180)), int(rng.integers(60, 360))
+    crop = Image.new("RGB", (width, height), "white")
+    draw = ImageDraw.Draw(crop)
+    for line in range(max(1, height // 40)):
+        draw.text((4, 4 + line * 36), "あいう", fill="black")
+    return crop
+
+
+def _load_samples(input_dir: Path, pages_limit: int, crops_limit: int, logger):
+    """Real pages and crops from *.boxes.json files in input_dir (may be empty)."""
+    from utils.image import crop_box, load_page, resolve_image_path
+
+    pages, crops = [], []
+    if not input_dir.exists():
+        return pages, crops
+    for box_file in sorted(input_dir.glob("*.boxes.json")):
+        if len(pages) >= pages_limit and len(crops) >= crops_limit:
+            break
+        try:
+            payload = json.loads(box_file.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            continue
+        file_id = payload.get("file_id") or box_file.name.replace(".boxes.json", "")
+        image_path = resolve_image_path(file_id)
+        if not image_path.exists():
+            continue
+        resized, _meta = load_page(image_path, logger)
+        if len(pages) < pages_limit:
+            pages.append(resized)
+        for b in payload.get("boxes") or []:
+            if len(crops) >= crops_limit:
+                break
+            crop, _coords = crop_box(resized, b)
+            if crop is not None:
+                crops.append(crop)
+    return pages, crops
+
+
+def _ms_per_item(run_chunk, items, batch_size: int) -> float:
+    """Warm up on the first chunk, then time every chunk; returns milliseconds per item."""
+    chunks = [items[i : i + batch_size] for i in range(0, len(items), batch_size)]
+    run_chunk(chunks[0])
+    start = time.perf_counter()
+    for chunk in chunks:
+        run_chunk(chunk)
+    return (time.perf_counter() - start) * 1000 / len(items)
+
+
+def _model_runner(name: str, device, logger):
+    """Return a callable running one batch through the named model (loads it once)."""
+    import torch
+
+    if name == "detector":
+        from models.detector import load_detector
+
+        model, processor = load_detector(logger)
+
+        def run(chunk):
+            inputs = processor(images=chunk, return_tensors="pt")
+            with torch.no_grad():
+                model(**inputs)
+
+        return run
+    if name == "manga-ocr":
+        from models.manga_ocr import load_manga_ocr
+        from services.ocr import run_manga_ocr_batch
+
+        load_manga_ocr(device, logger)
+        return lambda chunk: run_manga_ocr_batch(chunk, device, logger)
+    from models.paddleocr_vl import load_paddleocr_vl
+    from services.ocr import run_paddleocr_vl_batch
+
+    load_paddleocr_vl(device, logger)
+    return lambda chunk: run_paddleocr_vl_batch(chunk, device, "ja", logger)
+
+
+def _bench_grid(name, items, thread_grid, batch_grid, device, logger):
+    import torch
+
+    try:
+        run = _model_runner(name, device, logger)
+    except RuntimeError as exc:
+        logger.warning("skipping %s: %s", name, exc)
+        return []
+    rows = []
+    for threads in thread_grid:
+        torch.set_num_threads(threads)
+        for batch_size in batch_grid:
+            ms = _ms_per_item(run, items, batch_size)
+            row = {"threads": threads, "batch_size": batch_size, "ms_per_item": round(ms, 2)}
+            rows.append(row)
+            print(json.dumps({"model": name, **row}), flush=True)
+    return rows
+
+
+def _bench_workers(model_id, crops, cores, batch_size, worker_grid, logger):
+    """Throughput of the OCR worker pool for each worker count (threads split evenly)."""
+    import services.ocr_workers as ocr_workers
+
+    rows = []
+    for workers in worker_grid:
+        threads = max(1, cores // workers)
+        ocr_workers.OCR_WORKERS = workers
+        ocr_workers.OCR_WORKER_THREADS = threads
+        chunk = max(1, min(batch_size, math.ceil(len(crops) / workers)))
+        chunks = [crops[i : i + chunk] for i in range(0, len(crops), chunk)]
+
+        async def run_all():
+            await asyncio.gather(*(ocr_workers.run_in_ocr_pool(model_id, c, "ja", None, logger) for c in chunks))
+
+        try:
+            asyncio.run(run_all())  # starts the workers and loads one model per process
+            start = time.perf_counter()
+            asyncio.run(run_all())
+            ms = (time.perf_counter() - start) * 1000 / len(crops)
+        except Exception as exc:
+            logger.warning("worker benchmark failed for %s workers: %s", workers, exc)
+            continue
+        finally:
+            ocr_workers.shutdown_ocr_pool()
+        row = {"workers": workers, "threads_per_worker": threads, "batch_size": chunk, "ms_per_item": round(ms, 2)}
+        rows.append(row)
+        print(json.dumps({"model": model_id, **row}), flush=True)
+    return rows
+
+
+def _best(rows, **match):
+    candidates = [r for r in rows if all(r.get(k) == v for k, v in match.items())]
+    return min(candidates, key=lambda r: r["ms_per_item"]) if candidates else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark CPU inference settings and write a tuned profile")
+    parser.add_argument("--input-dir", default="tmp", help="Images + *.boxes.json to sample from (default: tmp)")
+    parser.add_argument("--models", default=",".join(MODELS), help=f"Models to tune (default: {','.join(MODELS)})")
+    parser.add_argument("--pages", type=int, default=8, help="Pages for the detector benchmark (default: 8)")
+    parser.add_argument("--crops", type=int, default=32, help="Crops for the OCR benchmarks (default: 32)")
+    parser.add_argument("--threads", default="", help="Thread counts to try (default: powers of two up to cores)")
+    parser.add_argument("--detect-batch-sizes", default="1,2,4,8", help="Detector batch sizes (default: 1,2,4,8)")
+    parser.add_argument("--manga-batch-sizes", default="1,4,8,16", help="manga-ocr batch sizes (default: 1,4,8,16)")
+    parser.add_argument("--paddle-batch-sizes", default="1,2,4", help="PaddleOCR-VL batch sizes (default: 1,2,4)")
+    parser.add_argument("--workers", default="", help="OCR worker counts to try (default: 2,4,... up to cores)")
+    parser.add_argument("--out", default="", help="Profile path (default: TUNED_PROFILE_PATH)")
+    args = parser.parse_args()
+
+    os.environ.setdefault("OCR_DEVICE", "cpu")
+    logging.basicConfig(level=logging.WARNING, format="%(asctime)s %(levelname)s %(message)s")
+    logger = logging.getLogger("autotune")
+
+    _ensure_backend_on_path()
+    import torch  # noqa: E402
+
+    from config import TUNED_PROFILE_PATH  # noqa: E402
+    from services.system import probe_hardware  # noqa: E402
+
+    hardware = probe_hardware()
+    print(json.dumps({"hardware": hardware}), flush=True)
+    cores = hardware["physical_cores"] or hardware["usable_cores"] or 1
+    thread_grid = _int_list(args.threads) if args.threads else _thread_grid(cores)
+    worker_grid = _int_list(args.workers) if args.workers else [w for w in _thread_grid(cores) if w > 1]
+    models = [m.strip() for m in args.models.split(",") if m.strip() in MODELS]
+
+    rng = np.random.default_rng(0)
+    pages, crops = _load_samples(Path(args.input_dir), args.pages, args.crops, logger)
+    pages += [synthetic_page(rng) for _ in range(args.pages - len(pages))]
+    crops += [_synthetic_crop(rng) for _ in range(args.crops - len(crops))]
+    device = torch.device("cpu")
+
+    benchmarks = {}
+    batch_grids = {
+        "detector": _int_list(args.detect_batch_sizes),
+        "manga-ocr": _int_list(args.manga_batch_sizes),
+        "paddleocr-vl": _int_list(args.paddle_batch_sizes),
+    }
+    for name in models:
+        items = pages if name == "detector" else crops
+        rows = _bench_grid(name, items, thread_grid, batch_grids[name], device, logger)
+        if rows:
+            benchmarks[name] = rows
+
+    settings = {}
+    if benchmarks:
+        # One process-wide thread count: the one with the lowest summed best time across models.
+        def total_ms(threads):
+            return sum(_best(rows, threads=threads)["ms_per_item"] for rows in benchmarks.values())
+
+        threads = min(thread_grid, key=total_ms)
+        settings["TORCH_THREADS"] = threads
+        settings["TORCH_INTEROP_THREADS"] = 1
+        keys = {"detector": "DETECT_BATCH_SIZE", "manga-ocr": "MANGA_OCR_BATCH_SIZE", "paddleocr-vl": "PADDLE_OCR_BATCH_SIZE"}
+        for name, rows in benchmarks.items():
+            settings[keys[name]] = _best(rows, threads=threads)["batch_size"]
+
+    ocr_model = "manga-ocr" if "manga-ocr" in benchmarks else ("paddleocr-vl" if "paddleocr-vl" in benchmarks else None)
+    if ocr_model and worker_grid:
+        in_process = _best(benchmarks[ocr_model], threads=settings["TORCH_THREADS"])
+        batch_key = "MANGA_OCR_BATCH_SIZE" if ocr_model == "manga-ocr" else "PADDLE_OCR_BATCH_SIZE"
+        worker_rows = _bench_workers(ocr_model, crops, cores, settings[batch_key], worker_grid, logger)
+        benchmarks["workers"] = [{"model": ocr_model, **row} for row in worker_rows]
+        best_pool = min(worker_rows, key=lambda r: r["ms_per_item"]) if worker_rows else None
+        if best_pool and best_pool["ms_per_item"] < in_process["ms_per_item"]:
+            settings["OCR_WORKERS"] = best_pool["workers"]
+            settings["OCR_WORKER_THREADS"] = best_pool["threads_per_worker"]
+        else:
+            settings["OCR_WORKERS"] = 0
+
+    profile = {
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "hardware": hardware,
+        "torch": torch.__version__,
+        "samples": {"pages": len(pages), "crops": len(crops)},
+        "settings": settings,
+        "benchmarks": benchmarks,
+    }
+    out_path = Path(args.out) if args.out else TUNED_PROFILE_PATH
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    out_path.write_text(json.dumps(profile, indent=2), encoding="utf-8")
+    print(json.dumps({"profile": str(out_path), "settings": settings}), flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,16 @@
+"""
+Synthetic inputs shared by the devtools benchmarks when no real pages are available.
+"""
+from PIL import Image, ImageDraw
+
+
+def synthetic_page(rng) -> Image.Image:
+    """A 905x1280 page with eight outlined bubbles of Japanese text at random positions."""
+    page = Image.new("RGB", (905, 1280), "white")
+    draw = ImageDraw.Draw(page)
+    for _ in range(8):
+        x, y = int(rng.integers(20, 760)), int(rng.integers(20, 1120))
+        draw.ellipse((x, y, x + 120, y + 140), outline="black", width=3)
+        for line in range(4):
+            draw.text((x + 30, y + 25 + line * 24), "テスト", fill="black")
+    return page
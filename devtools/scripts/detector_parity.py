@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Parity check: ONNX Runtime detector engines against the PyTorch detector.
+Runs the same preprocessed pages through the PyTorch model and each ONNX engine (exporting and
+quantizing on first use), then compares raw logits/pred_boxes and the post-processed boxes:
+every PyTorch box above --threshold must have an ONNX box of the same label whose corners are
+within the pixel tolerance. Exits 1 on any mismatch. The raw tensor differences are reported in
+query order, so near-tied encoder scores can make them large while the boxes still match.
+Uses pages from --input-dir (images + *.boxes.json, e.g. tmp/) or synthetic pages.
+"""
+import argparse
+import json
+import logging
+import sys
+from pathlib import Path
+
+import numpy as np
+
+from bench_pages import synthetic_page
+
+ENGINES = ("onnx", "onnx-int8")
+
+
+def _ensure_backend_on_path():
+    backend_dir = Path(__file__).resolve().parents[2] / "backend"
+    if str(backend_dir) not in sys.path:
+        sys.path.insert(0, str(backend_dir))
+
+
+def _load_pages(input_dir: Path, limit: int, logger):
+    from utils.image import load_page, resolve_image_path
+
+    pages = []
+    if not input_dir.exists():
+        return pages
+    for box_file in sorted(input_dir.glob("*.boxes.json")):
+        if len(pages) >= limit:
+            break
+        file_id = box_file.name.replace(".boxes.json", "")
+        image_path = resolve_image_path(file_id)
+        if image_path.exists():
+            pages.append(load_page(image_path, logger)[0])
+    return pages
+
+
+def _boxes(processor, outputs, sizes, threshold):
+    import torch
+
+    target_sizes = torch.tensor(sizes, dtype=torch.int64)
+    return processor.post_process_object_detection(outputs, threshold=threshold, target_sizes=target_sizes)
+
+
+def _match(reference, candidate, tol_px: float):
+    """Count reference boxes without a same-label candidate box within tol_px on every corner."""
+    missing = 0
+    worst = 0.0
+    ref_boxes, ref_labels = reference["boxes"].numpy(), reference["labels"].numpy()
+    cand_boxes, cand_labels = candidate["boxes"].numpy(), candidate["labels"].numpy()
+    for box, label in zip(ref_boxes, ref_labels):
+        same = cand_boxes[cand_labels == label]
+        if not len(same):
+            missing += 1
+            continue
+        err = float(np.abs(same - box).max(axis=1).min())
+        worst = max(worst, err)
+        if err > tol_px:
+            missing += 1
+    return missing, worst
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare ONNX detector engines with the PyTorch detector")
+    parser.add_argument("--input-dir", default="tmp", help="Images + *.boxes.json to sample from (default: tmp)")
+    parser.add_argument("--pages", type=int, default=4, help="Pages to compare (default: 4)")
+    parser.add_argument("--engines", default=",".join(ENGINES), help=f"Engines to check (default: {','.join(ENGINES)})")
+    parser.add_argument("--threshold", type=float, default=0.3, help="Score threshold for compared boxes (default: 0.3)")
+    parser.add_argument("--box-tol", type=float, default=2.0, help="fp32 corner tolerance in pixels (default: 2.0)")
+    parser.add_argument("--int8-box-tol", type=float, default=12.0, help="int8 corner tolerance in pixels (default: 12.0)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING, format="%(asctime)s %(levelname)s %(message)s")
+    logger = logging.getLogger("detector_parity")
+    _ensure_backend_on_path()
+    import torch  # noqa: E402
+    from transformers import AutoConfig  # noqa: E402
+
+    from config import DETECTOR_DIR  # noqa: E402
+    from models.detector import _load_torch_detector, _weights_fingerprint  # noqa: E402
+    from models.detector_onnx import load_onnx_detector  # noqa: E402
+    from transformers import AutoImageProcessor  # noqa: E402
+
+    rng = np.random.default_rng(0)
+    pages = _load_pages(Path(args.input_dir), args.pages, logger)
+    pages += [synthetic_page(rng) for _ in range(args.pages - len(pages))]
+    sizes = [[page.height, page.width] for page in pages]
+
+    processor = AutoImageProcessor.from_pretrained(DETECTOR_DIR)
+    pixel_values = processor(images=pages, return_tensors="pt")["pixel_values"]
+    torch_model = _load_torch_detector().eval()
+    with torch.no_grad():
+        reference = torch_model(pixel_values=pixel_values)
+    reference_boxes = _boxes(processor, reference, sizes, args.threshold)
+
+    failed = False
+    config = AutoConfig.from_pretrained(DETECTOR_DIR)
+    for engine in [e.strip() for e in args.engines.split(",") if e.strip() in ENGINES]:
+        quantized = engine == "onnx-int8"
+        model = load_onnx_detector(
+            _load_torch_detector, processor, config, _weights_fingerprint(), logger, quantized=quantized
+        )
+        outputs = model(pixel_values=pixel_values)
+        tol = args.int8_box_tol if quantized else args.box_tol
+        candidate_boxes = _boxes(processor, outputs, sizes, args.threshold)
+        missing = worst = 0
+        for ref, cand in zip(reference_boxes, candidate_boxes):
+            page_missing, page_worst = _match(ref, cand, tol)
+            missing += page_missing
+            worst = max(worst, page_worst)
+        report = {
+            "engine": engine,
+            "pages": len(pages),
+            "max_abs_logits": round(float((outputs.logits - reference.logits).abs().max()), 5),
+            "max_abs_pred_boxes": round(float((outputs.pred_boxes - reference.pred_boxes).abs().max()), 5),
+            "reference_boxes": sum(len(r["boxes"]) for r in reference_boxes),
+            "engine_boxes": sum(len(c["boxes"]) for c in candidate_boxes),
+            "worst_corner_px": round(worst, 2),
+            "tolerance_px": tol,
+            "unmatched": missing,
+            "ok": missing == 0,
+        }
+        print(json.dumps(report), flush=True)
+        failed = failed or missing > 0
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
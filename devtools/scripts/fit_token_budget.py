@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Fit a per-crop OCR token budget from ocr_token_bench.py runs.jsonl.
+Quantile (pinball-loss) linear regression of the token count on sqrt(area), log(aspect) and box type,
+solved by iteratively reweighted least squares. The fitted parameters are merged into
+backend/token_budget.json (TOKEN_BUDGET_PATH), which both OCR paths use as their generation budget.
+"""
+import argparse
+import json
+import math
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+
+# Which token count a model's budget caps: manga-ocr's max_length counts every decoder token
+# (start/end included); PaddleOCR-VL's max_new_tokens counts generated tokens only.
+TARGET_FIELDS = {"manga-ocr": "token_count", "paddleocr-vl": "token_count_no_special"}
+
+
+def _default_out() -> Path:
+    return Path(__file__).resolve().parents[2] / "backend" / "token_budget.json"
+
+
+def _load_records(paths, model: str):
+    records = []
+    for path in paths:
+        with Path(path).open(encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                if record.get("model", "manga-ocr") != model:
+                    continue
+                size = record.get("crop_size") or []
+                if len(size) != 2 or min(size) <= 0 or record.get(TARGET_FIELDS[model]) is None:
+                    continue
+                records.append(record)
+    return records
+
+
+def _design_matrix(records, types):
+    rows = []
+    for record in records:
+        width, height = record["crop_size"]
+        row = [1.0, math.sqrt(width * height), math.log(height / width)]
+        row += [1.0 if record.get("box_type") == t else 0.0 for t in types]
+        rows.append(row)
+    return np.asarray(rows, dtype=np.float64)
+
+
+def fit_quantile(x: np.ndarray, y: np.ndarray, quantile: float, iterations: int = 200) -> np.ndarray:
+    """Linear quantile regression via IRLS on the pinball loss."""
+    ridge = 1e-6 * np.eye(x.shape[1])
+    beta = np.linalg.lstsq(x, y, rcond=None)[0]
+    for _ in range(iterations):
+        residual = y - x @ beta
+        weights = np.where(residual >= 0, quantile, 1.0 - quantile) / np.maximum(np.abs(residual), 1e-3)
+        xw = x * weights[:, None]
+        updated = np.linalg.solve(x.T @ xw + ridge, xw.T @ y)
+        if np.max(np.abs(updated - beta)) < 1e-6:
+            beta = updated
+            break
+        beta = updated
+    return beta
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fit OCR token budgets from token statistics")
+    parser.add_argument("runs", nargs="+", help="runs.jsonl files from ocr_token_bench.py")
+    parser.add_argument("--model", default="manga-ocr", choices=sorted(TARGET_FIELDS), help="Model the runs belong to")
+    parser.add_argument("--quantile", type=float, default=0.98, help="Target quantile (default: 0.98)")
+    parser.add_argument("--margin", type=int, default=2, help="Tokens added on top of the prediction (default: 2)")
+    parser.add_argument("--min-tokens", type=int, default=16, help="Lower clamp for the budget (default: 16)")
+    parser.add_argument("--max-tokens", type=int, default=0, help="Upper clamp (default: observed max + margin)")
+    parser.add_argument(
+        "--min-type-samples",
+        type=int,
+        default=30,
+        help="Box types with fewer samples share the base intercept (default: 30)",
+    )
+    parser.add_argument("--out", default=str(_default_out()), help="Budget file to update (default: backend/token_budget.json)")
+    args = parser.parse_args()
+
+    records = _load_records(args.runs, args.model)
+    if len(records) < 10:
+        raise SystemExit(f"need at least 10 records for {args.model}, got {len(records)}")
+    target = TARGET_FIELDS[args.model]
+    y = np.asarray([record[target] for record in records], dtype=np.float64)
+
+    counts = {}
+    for record in records:
+        box_type = record.get("box_type") or ""
+        counts[box_type] = counts.get(box_type, 0) + 1
+    # Most common type is the baseline; other well-sampled types get their own offset.
+    ranked = sorted(counts, key=counts.get, reverse=True)
+    types = [t for t in ranked[1:] if t and counts[t] >= args.min_type_samples]
+
+    x = _design_matrix(records, types)
+    beta = fit_quantile(x, y, args.quantile)
+    max_tokens = args.max_tokens or int(y.max()) + args.margin
+    budget = np.clip(np.ceil(x @ beta + args.margin), args.min_tokens, max_tokens)
+
+    params = {
+        "quantile": args.quantile,
+        "target": target,
+        "coef": {
+            "intercept": round(float(beta[0]), 6),
+            "sqrt_area": round(float(beta[1]), 6),
+            "log_aspect": round(float(beta[2]), 6),
+        },
+        "type_offset": {t: round(float(b), 6) for t, b in zip(types, beta[3:])},
+        "margin": args.margin,
+        "min_tokens": args.min_tokens,
+        "max_tokens": max_tokens,
+        "samples": len(records),
+        "coverage": round(float(np.mean(y <= budget)), 4),
+        "mean_budget": round(float(budget.mean()), 2),
+        "mean_tokens": round(float(y.mean()), 2),
+        "fitted_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+    }
+
+    out_path = Path(args.out)
+    try:
+        existing = json.loads(out_path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        existing = {}
+    existing.setdefault("models", {})[args.model] = params
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    out_path.write_text(json.dumps(existing, indent=2) + "\n", encoding="utf-8")
+    print(json.dumps({"model": args.model, "out": str(out_path), **params}))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Cold-start benchmark: run `python -X importtime -c "import app"` in a fresh interpreter.
+Reports total import time, the slowest modules, and whether torch/transformers were imported.
+Appends one JSON line per run to --history so startup regressions can be tracked over time.
+"""
+import argparse
+import json
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+HEAVY_MODULES = ("torch", "transformers", "requests")
+REPO_ROOT = Path(__file__).resolve().parents[2]
+
+
+def _backend_dir() -> Path:
+    return REPO_ROOT / "backend"
+
+
+def _parse_importtime(stderr: str):
+    """Parse `-X importtime` lines into (module, self_us, cumulative_us) tuples."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3:
+            continue
+        try:
+            rows.append((parts[2].strip(), int(parts[0]), int(parts[1])))
+        except ValueError:
+            continue
+    return rows
+
+
+def _run_once(module: str):
+    start = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=_backend_dir(),
+        capture_output=True,
+        text=True,
+    )
+    wall_ms = (time.perf_counter() - start) * 1000
+    if proc.returncode != 0:
+        raise SystemExit(f"import {module} failed:\n{proc.stderr[-2000:]}")
+    return wall_ms, _parse_importtime(proc.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backend import-time (cold start) benchmark")
+    parser.add_argument("--module", default="app", help="Module to import from backend/ (default: app)")
+    parser.add_argument("--repeat", type=int, default=3, help="Fresh interpreters to run (default: 3)")
+    parser.add_argument("--top", type=int, default=10, help="Slowest modules to print (default: 10)")
+    parser.add_argument(
+        "--history",
+        default=str(REPO_ROOT / "logs" / "import_time.jsonl"),
+        help="JSONL file to append results to (default: <repo>/logs/import_time.jsonl, empty to disable)",
+    )
+    parser.add_argument(
+        "--check",
+        action="store_true",
+        help="Exit non-zero if torch or transformers are imported at startup",
+    )
+    args = parser.parse_args()
+
+    runs = [_run_once(args.module) for _ in range(max(1, args.repeat))]
+    wall_ms, rows = min(runs, key=lambda run: run[0])
+    imported = {name for name, _, _ in rows}
+    top_level = {name.split(".")[0] for name in imported}
+    target = next((cumulative for name, _, cumulative in rows if name == args.module), 0)
+    summary = {
+        "module": args.module,
+        "saved_at": time.time(),
+        "import_ms": round(target / 1000, 1),
+        "wall_ms": round(wall_ms, 1),
+        "modules": len(imported),
+        "heavy": sorted(m for m in HEAVY_MODULES if m in top_level),
+    }
+    print(json.dumps(summary))
+    for name, self_us, cumulative_us in sorted(rows, key=lambda r: r[1], reverse=True)[: args.top]:
+        print(f"{self_us / 1000:9.1f} ms self {cumulative_us / 1000:9.1f} ms cumulative  {name}")
+
+    if args.history:
+        history = Path(args.history)
+        history.parent.mkdir(parents=True, exist_ok=True)
+        with history.open("a", encoding="utf-8") as f:
+            f.write(json.dumps(summary) + "\n")
+
+    if args.check and {"torch", "transformers"} & top_level:
+        raise SystemExit(f"startup imports heavy modules: {summary['heavy']}")
+
+
+if __name__ == "__main__":
+    main()
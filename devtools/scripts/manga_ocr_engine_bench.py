@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+manga-ocr engine benchmark: speed and character error rate of each MANGA_OCR_ENGINE on a stored
+crop set.
+The crop set is a directory of crop images plus an optional labels.jsonl
+({"file": "<name>.png", "text": "<reference>"} per line). Without labels the float32 torch engine
+output is the reference. --save-crops builds a crop set from --input-dir (images + *.boxes.json,
+e.g. tmp/) and writes the torch output as provisional labels to be corrected by hand.
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+from pathlib import Path
+
+from PIL import Image
+
+ENGINES = ("torch", "int8")
+IMAGE_SUFFIXES = {".png", ".jpg", ".jpeg", ".webp"}
+REPO_ROOT = Path(__file__).resolve().parents[2]
+
+
+def _ensure_backend_on_path():
+    backend_dir = REPO_ROOT / "backend"
+    if str(backend_dir) not in sys.path:
+        sys.path.insert(0, str(backend_dir))
+
+
+def _edit_distance(a: str, b: str) -> int:
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        previous = current
+    return previous[-1]
+
+
+def character_error_rate(references, hypotheses) -> float:
+    """Corpus CER: total edit distance over total reference characters."""
+    errors = sum(_edit_distance(ref, hyp) for ref, hyp in zip(references, hypotheses))
+    return errors / max(1, sum(len(ref) for ref in references))
+
+
+def _save_crops(input_dir: Path, crops_dir: Path, limit: int, logger):
+    from utils.image import crop_box, load_page, resolve_image_path
+
+    crops_dir.mkdir(parents=True, exist_ok=True)
+    names = []
+    for box_file in sorted(input_dir.glob("*.boxes.json")):
+        payload = json.loads(box_file.read_text(encoding="utf-8"))
+        file_id = payload.get("file_id") or box_file.name.replace(".boxes.json", "")
+        image_path = resolve_image_path(file_id)
+        if not image_path.exists():
+            continue
+        resized, _meta = load_page(image_path, logger)
+        for idx, box in enumerate(payload.get("boxes") or []):
+            if len(names) >= limit:
+                return names
+            crop, _coords = crop_box(resized, box)
+            if crop is None:
+                continue
+            name = f"{file_id}_{idx:03d}.png"
+            crop.save(crops_dir / name)
+            names.append(name)
+    return names
+
+
+def _load_crop_set(crops_dir: Path):
+    labels = {}
+    labels_path = crops_dir / "labels.jsonl"
+    if labels_path.exists():
+        for line in labels_path.read_text(encoding="utf-8").splitlines():
+            if line.strip():
+                record = json.loads(line)
+                labels[record["file"]] = record["text"]
+    files = sorted(p for p in crops_dir.iterdir() if p.suffix.lower() in IMAGE_SUFFIXES)
+    crops = [Image.open(p).convert("RGB") for p in files]
+    return [p.name for p in files], crops, labels
+
+
+def _run(crops, batch_size, device, logger):
+    from services.ocr import run_manga_ocr_batch
+
+    run_manga_ocr_batch(crops[:batch_size], device, logger)  # warmup
+    texts = []
+    start = time.perf_counter()
+    for i in range(0, len(crops), batch_size):
+        texts.extend(run_manga_ocr_batch(crops[i : i + batch_size], device, logger))
+    return texts, (time.perf_counter() - start) * 1000 / len(crops)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare manga-ocr engines (speed and CER) on a stored crop set")
+    parser.add_argument(
+        "--crops-dir",
+        default=str(REPO_ROOT / "logs" / "manga_ocr_crops"),
+        help="Crop set directory (default: <repo>/logs/manga_ocr_crops)",
+    )
+    parser.add_argument("--save-crops", action="store_true", help="Build the crop set from --input-dir first")
+    parser.add_argument(
+        "--input-dir",
+        default=str(REPO_ROOT / "tmp"),
+        help="Images + *.boxes.json for --save-crops (default: <repo>/tmp)",
+    )
+    parser.add_argument("--limit", type=int, default=200, help="Max crops saved by --save-crops (default: 200)")
+    parser.add_argument("--engines", default=",".join(ENGINES), help=f"Engines to compare (default: {','.join(ENGINES)})")
+    parser.add_argument("--batch-size", type=int, default=8, help="Crops per generate call (default: 8)")
+    parser.add_argument("--threads", type=int, default=0, help="torch threads (default: torch default)")
+    parser.add_argument("--out", default="", help="Optional JSON report path")
+    args = parser.parse_args()
+
+    # The float32 model is loaded once and quantized in place for the int8 run.
+    os.environ["MANGA_OCR_ENGINE"] = "torch"
+    logging.basicConfig(level=logging.WARNING, format="%(asctime)s %(levelname)s %(message)s")
+    logger = logging.getLogger("manga_ocr_engine_bench")
+    _ensure_backend_on_path()
+    import torch  # noqa: E402
+
+    from models.manga_ocr import load_manga_ocr, quantize_manga_ocr  # noqa: E402
+    from models.registry import module_footprint_bytes  # noqa: E402
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+    device = torch.device("cpu")
+    crops_dir = Path(args.crops_dir)
+    model = load_manga_ocr(device, logger)
+    if args.save_crops:
+        names = _save_crops(Path(args.input_dir), crops_dir, args.limit, logger)
+        if names:
+            from services.ocr import run_manga_ocr_batch
+
+            crops = [Image.open(crops_dir / name).convert("RGB") for name in names]
+            texts = []
+            for i in range(0, len(crops), args.batch_size):
+                texts.extend(run_manga_ocr_batch(crops[i : i + args.batch_size], device, logger))
+            with (crops_dir / "labels.jsonl").open("w", encoding="utf-8") as f:
+                for name, text in zip(names, texts):
+                    f.write(json.dumps({"file": name, "text": text}, ensure_ascii=False) + "\n")
+        print(json.dumps({"saved_crops": len(names), "crops_dir": str(crops_dir)}), flush=True)
+
+    names, crops, labels = _load_crop_set(crops_dir)
+    if not crops:
+        raise SystemExit(f"no crops in {crops_dir} (use --save-crops)")
+    # torch always runs first: it is the speed/CER reference, and int8 quantizes the model in place.
+    requested = {e.strip() for e in args.engines.split(",")}
+    engines = ["torch"] + [e for e in ENGINES if e != "torch" and e in requested]
+
+    references = [labels.get(name) for name in names]
+    labelled = [i for i, ref in enumerate(references) if ref is not None]
+    reports = []
+    torch_texts = None
+    torch_ms = None
+    for engine in engines:
+        if engine == "int8":
+            quantize_manga_ocr(model, logger)
+        texts, ms = _run(crops, args.batch_size, device, logger)
+        if engine == "torch":
+            torch_texts, torch_ms = texts, ms
+        report = {
+            "engine": engine,
+            "crops": len(crops),
+            "ms_per_crop": round(ms, 2),
+            "speedup": round(torch_ms / ms, 3),
+            "weights_mb": round(module_footprint_bytes(model.model) / (1024 * 1024), 1),
+            "cer_vs_torch": round(character_error_rate(torch_texts, texts), 4),
+            "exact_vs_torch": round(sum(a == b for a, b in zip(torch_texts, texts)) / len(texts), 4),
+        }
+        if labelled:
+            report["labelled"] = len(labelled)
+            report["cer"] = round(
+                character_error_rate([references[i] for i in labelled], [texts[i] for i in labelled]), 4
+            )
+        reports.append(report)
+        print(json.dumps(report, ensure_ascii=False), flush=True)
+
+    if args.out:
+        out_path = Path(args.out)
+        out_path.parent.mkdir(parents=True, exist_ok=True)
+        out_path.write_text(json.dumps({"crops_dir": str(crops_dir), "reports": reports}, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
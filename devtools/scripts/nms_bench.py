@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark: dict-based suppress_overlaps vs NumPy suppress_overlaps_array.
+Generates random candidate boxes (normalized coords) and times both engines.
+"""
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+
+def _ensure_backend_on_path():
+    backend_dir = Path(__file__).resolve().parents[2] / "backend"
+    if str(backend_dir) not in sys.path:
+        sys.path.insert(0, str(backend_dir))
+
+
+def _make_candidates(rng, count: int):
+    xy = rng.random((count, 2)) * 0.9
+    wh = rng.random((count, 2)) * 0.1 + 0.005
+    arr = np.concatenate([xy, wh], axis=1)
+    scores = rng.random(count)
+    dicts = [
+        {"x": x, "y": y, "w": w, "h": h, "score": s}
+        for (x, y, w, h), s in zip(arr.tolist(), scores.tolist())
+    ]
+    return arr, scores, dicts
+
+
+def _time_call(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Overlap suppression micro-benchmark")
+    parser.add_argument(
+        "--sizes",
+        default="100,1000,10000",
+        help="Comma-separated candidate counts (default: 100,1000,10000)",
+    )
+    parser.add_argument(
+        "--max-boxes",
+        type=int,
+        default=10,
+        help="max_boxes early exit (default: 10; use a large value to disable)",
+    )
+    parser.add_argument(
+        "--iou",
+        type=float,
+        default=None,
+        help="Also time IoU-based NMS with this threshold (default: strict rule only)",
+    )
+    parser.add_argument("--repeat", type=int, default=5, help="Repetitions per measurement (default: 5)")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed (default: 0)")
+    args = parser.parse_args()
+
+    _ensure_backend_on_path()
+    from utils.boxes import suppress_overlaps, suppress_overlaps_array  # noqa: E402
+
+    rng = np.random.default_rng(args.seed)
+    rows = []
+    for count in [int(v) for v in args.sizes.split(",") if v.strip()]:
+        arr, scores, dicts = _make_candidates(rng, count)
+        legacy = suppress_overlaps(dicts, args.max_boxes)
+        kept = suppress_overlaps_array(arr, scores, args.max_boxes)
+        if [id(b) for b in legacy] != [id(dicts[i]) for i in kept]:
+            raise SystemExit(f"engines disagree at n={count}")
+        row = {
+            "candidates": count,
+            "kept": len(kept),
+            "dict_ms": round(_time_call(lambda: suppress_overlaps(dicts, args.max_boxes), args.repeat), 3),
+            "numpy_ms": round(
+                _time_call(lambda: suppress_overlaps_array(arr, scores, args.max_boxes), args.repeat), 3
+            ),
+        }
+        row["speedup"] = round(row["dict_ms"] / row["numpy_ms"], 1) if row["numpy_ms"] else None
+        if args.iou is not None:
+            row["numpy_iou_ms"] = round(
+                _time_call(lambda: suppress_overlaps_array(arr, scores, args.max_boxes, args.iou), args.repeat),
+                3,
+            )
+        rows.append(row)
+        print(json.dumps(row))
+
+
+if __name__ == "__main__":
+    main()
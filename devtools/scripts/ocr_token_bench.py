@@ -1,7 +1,7 @@
 #!/usr/bin/env python3
 """
-Run manga-ocr on detected boxes and log token statistics.
-Writes per-box JSONL and summary/token frequency JSON.
+Run manga-ocr or PaddleOCR-VL on detected boxes and log token statistics.
+Writes per-box JSONL and summary/token frequency JSON (input for fit_token_budget.py).
 """
 import argparse
 import json
@@ -32,8 +32,40 @@ def _iter_boxes_files(input_dir: Path):
             yield path
 
 
+def _manga_ocr_generate(model, post_process):
+    def generate(crop):
+        pixel_values = model.processor(np.array(crop), return_tensors="pt").pixel_values.squeeze()
+        with torch.no_grad():
+            token_ids = model.model.generate(pixel_values[None].to(model.model.device))[0].cpu().tolist()
+        return token_ids, post_process(model.tokenizer.decode(token_ids, skip_special_tokens=True))
+
+    return generate
+
+
+def _paddleocr_vl_generate(model, processor, lang, max_new_tokens):
+    from services.ocr import _paddle_autocast, _paddle_device_inputs, _paddle_inputs  # noqa: E402
+
+    device = next(model.parameters()).device
+
+    def generate(crop):
+        inputs = _paddle_device_inputs(_paddle_inputs(processor, [crop], lang), device)
+        with torch.no_grad(), _paddle_autocast():
+            generated = model.generate(**inputs, do_sample=False, max_new_tokens=max_new_tokens)
+        # Only generated tokens count: PaddleOCR-VL's budget is max_new_tokens.
+        token_ids = generated[0, inputs["input_ids"].shape[-1] :].cpu().tolist()
+        return token_ids, processor.tokenizer.decode(token_ids, skip_special_tokens=True).strip()
+
+    return generate
+
+
 def main():
-    parser = argparse.ArgumentParser(description="MangaOCR token statistics")
+    parser = argparse.ArgumentParser(description="OCR token statistics")
+    parser.add_argument(
+        "--model",
+        default="manga-ocr",
+        choices=["manga-ocr", "paddleocr-vl"],
+        help="OCR model to run (default: manga-ocr)",
+    )
     parser.add_argument(
         "--input-dir",
         default="tmp",
@@ -49,6 +81,17 @@ def main():
         default="cpu",
         help="Device for OCR (default: cpu)",
     )
+    parser.add_argument(
+        "--lang",
+        default="ja",
+        help="PaddleOCR-VL prompt language (default: ja)",
+    )
+    parser.add_argument(
+        "--max-new-tokens",
+        type=int,
+        default=256,
+        help="PaddleOCR-VL generation cap, high enough not to truncate (default: 256)",
+    )
     parser.add_argument(
         "--limit",
         type=int,
@@ -61,9 +104,7 @@ def main():
     logger = logging.getLogger("ocr_token_bench")
 
     _ensure_backend_on_path()
-    from models.manga_ocr import load_manga_ocr  # noqa: E402
-    from modules.ocr.manga_ocr.engine import post_process  # noqa: E402
-    from utils.image import crop_box, ensure_image, resolve_image_path, resize_for_model  # noqa: E402
+    from utils.image import crop_box, load_page, resolve_image_path  # noqa: E402
 
     input_dir = Path(args.input_dir)
     out_dir = Path(args.out_dir)
@@ -75,10 +116,22 @@ def main():
     if not input_dir.exists():
         raise SystemExit(f"Input dir not found: {input_dir}")
 
-    logger.info("loading manga-ocr model")
-    model = load_manga_ocr(torch.device(args.device), logger)
+    logger.info("loading %s model", args.model)
+    if args.model == "paddleocr-vl":
+        from models.paddleocr_vl import load_paddleocr_vl  # noqa: E402
+
+        model, processor = load_paddleocr_vl(torch.device(args.device), logger)
+        tokenizer = processor.tokenizer
+        generate = _paddleocr_vl_generate(model, processor, args.lang, args.max_new_tokens)
+    else:
+        from models.manga_ocr import load_manga_ocr  # noqa: E402
+        from modules.ocr.manga_ocr.engine import post_process  # noqa: E402
+
+        model = load_manga_ocr(torch.device(args.device), logger)
+        tokenizer = model.tokenizer
+        generate = _manga_ocr_generate(model, post_process)
 
-    special_ids = set(getattr(model.tokenizer, "all_special_ids", []))
+    special_ids = set(getattr(tokenizer, "all_special_ids", []))
     token_counts = {}
     total_tokens = 0
     total_tokens_no_special = 0
@@ -104,8 +157,7 @@ def main():
             if not image_path.exists():
                 logger.warning("image not found for %s", file_id)
                 continue
-            img = ensure_image(image_path, logger)
-            resized, meta = resize_for_model(img)
+            resized, meta = load_page(image_path, logger)
 
             for b in boxes:
                 if args.limit and processed_boxes >= args.limit:
@@ -113,17 +165,8 @@ def main():
                 crop, crop_coords = crop_box(resized, b)
                 if crop is None:
                     continue
-                np_img = np.array(crop)
-                pixel_values = model.processor(np_img, return_tensors="pt").pixel_values.squeeze()
-                with torch.no_grad():
-                    token_ids = (
-                        model.model.generate(pixel_values[None].to(model.model.device))[0]
-                        .cpu()
-                        .tolist()
-                    )
-
-                tokens = _convert_ids_to_tokens(model.tokenizer, token_ids)
-                text = post_process(model.tokenizer.decode(token_ids, skip_special_tokens=True))
+                token_ids, text = generate(crop)
+                tokens = _convert_ids_to_tokens(tokenizer, token_ids)
 
                 special_count = sum(1 for tid in token_ids if tid in special_ids)
                 token_count = len(token_ids)
@@ -137,6 +180,7 @@ def main():
                     token_counts[tok] = token_counts.get(tok, 0) + 1
 
                 record = {
+                    "model": args.model,
                     "file_id": file_id,
                     "image": str(image_path),
                     "box_id": b.get("id"),
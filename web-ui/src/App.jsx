@@ -30,7 +30,7 @@ import { CLASS_COLORS } from './constants/detection.js'
 // Utils
 import { makeBoxId, orderBoxes, sortAndReindexBoxes } from './utils/boxes.js'
 import { normalizeName, uniqueName } from './utils/files.js'
-import { getSystemCpu } from './services/api.js'
+import { getReadiness, getSystemCpu } from './services/api.js'
 
 function App() {
   const [activeView, setActiveView] = useState('ocr')
@@ -45,6 +45,7 @@ function App() {
   const [selectedConflictId, setSelectedConflictId] = useState(null)
   const [applyToAllConflicts, setApplyToAllConflicts] = useState(false)
   const [cpuName, setCpuName] = useState('…')
+  const [modelStatus, setModelStatus] = useState({ loading: [], failed: [] })
   const [visibleTooltipBoxId, setVisibleTooltipBoxId] = useState(null)
   const [showAllTranslations, setShowAllTranslations] = useState(false)
   const [activeTool, setActiveTool] = useState('draw')
@@ -497,6 +498,36 @@ function App() {
       .catch(() => setCpuName('Unknown'))
   }, [])
 
+  // Poll model readiness: models still loading or warming up are shown instead of looking hung
+  useEffect(() => {
+    let cancelled = false
+    let timer = null
+    const poll = async () => {
+      let busy = false
+      try {
+        const data = await getReadiness()
+        const entries = Object.entries(data.models || {})
+        const loading = entries.filter(([, m]) => m.state === 'loading').map(([name]) => name)
+        const failed = entries.filter(([, m]) => m.error).map(([name]) => name)
+        busy = !data.ready || loading.length > 0
+        if (!cancelled) {
+          setModelStatus({ loading, failed })
+        }
+      } catch {
+        // Backend not reachable yet: keep polling
+        busy = true
+      }
+      if (!cancelled) {
+        timer = setTimeout(poll, busy ? 1500 : 5000)
+      }
+    }
+    poll()
+    return () => {
+      cancelled = true
+      clearTimeout(timer)
+    }
+  }, [])
+
   // Save API key to localStorage
   useEffect(() => {
     try {
@@ -890,7 +921,12 @@ function App() {
 
   return (
     <div className="app">
-      <Header cpuName={cpuName} activeView={activeView} setActiveView={setActiveView} />
+      <Header
+        cpuName={cpuName}
+        modelStatus={modelStatus}
+        activeView={activeView}
+        setActiveView={setActiveView}
+      />
 
       {activeView === 'ocr' ? (
         <>
@@ -1,10 +1,18 @@
 // Header component
-export const Header = ({ cpuName, activeView, setActiveView }) => {
+export const Header = ({ cpuName, modelStatus, activeView, setActiveView }) => {
+  const loading = modelStatus?.loading || []
+  const failed = modelStatus?.failed || []
   return (
     <header className="header">
       <div>
         <p className="eyebrow">Локальный OCR интерфейс · {cpuName}</p>
         <h1>Рабочая станция Manga OCR</h1>
+        {(loading.length > 0 || failed.length > 0) && (
+          <div className="model-status">
+            {loading.length > 0 && <span className="pill">Загрузка моделей: {loading.join(', ')}…</span>}
+            {failed.length > 0 && <span className="pill error">Ошибка загрузки: {failed.join(', ')}</span>}
+          </div>
+        )}
       </div>
       <div className="header-actions">
         <button
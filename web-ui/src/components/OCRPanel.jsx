@@ -133,7 +133,7 @@ export const OCRPanel = ({
         </label>
       </div>
       {isOcr && ocrProgress.total > 0 && (
-        <ProgressBar current={ocrProgress.current} total={ocrProgress.total} label="областей" />
+        <ProgressBar current={ocrProgress.current} total={ocrProgress.total} label="областей" etaMs={ocrProgress.etaMs} />
       )}
     </div>
   )
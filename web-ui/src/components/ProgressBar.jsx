@@ -1,5 +1,5 @@
 // Progress bar component
-export const ProgressBar = ({ current, total, label }) => {
+export const ProgressBar = ({ current, total, label, etaMs }) => {
   if (total === 0) return null
   return (
     <div className="progress-bar-container">
@@ -9,7 +9,10 @@ export const ProgressBar = ({ current, total, label }) => {
           style={{ width: `${(current / total) * 100}%` }}
         />
       </div>
-      <span className="progress-text">{current} / {total} {label}</span>
+      <span className="progress-text">
+        {current} / {total} {label}
+        {etaMs > 0 && ` · ~${Math.ceil(etaMs / 1000)} с`}
+      </span>
     </div>
   )
 }
@@ -14,3 +14,5 @@ export const CLASS_COLORS = {
   text_free: '#c2551f',
 }
 
+// Pages per /api/detect/batch request (server batches forward passes within a request)
+export const DETECT_PAGES_PER_REQUEST = 8
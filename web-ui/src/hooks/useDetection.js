@@ -1,6 +1,7 @@
 // Detection hook
 import { useState } from 'react'
-import { runDetection } from '../services/detection.js'
+import { runDetection, runDetectionBatch } from '../services/detection.js'
+import { DETECT_PAGES_PER_REQUEST } from '../constants/detection.js'
 import { sortAndReindexBoxes } from '../utils/boxes.js'
 import { logStep } from '../utils/api.js'
 
@@ -23,8 +24,17 @@ export const useDetection = (fileItemsRef, activeFileId, setFileBoxes, setBoxes,
     }
     setIsDetecting(true)
     setDetectProgress({ current: 0, total: targets.length })
+    const applyDetected = (file, detected) => {
+      setFileBoxes((prev) => ({ ...prev, [file.id]: detected }))
+      if (file.id === activeFileId) {
+        setBoxes(detected)
+        // Do not auto-select boxes created by the detector
+        setSelectedBoxIds([])
+      }
+    }
     try {
       let processed = 0
+      const runnable = []
       for (const file of targets) {
         if (!file?.serverId) {
           console.warn('[detect] skip file without serverId', file)
@@ -32,6 +42,10 @@ export const useDetection = (fileItemsRef, activeFileId, setFileBoxes, setBoxes,
           setDetectProgress({ current: processed, total: targets.length })
           continue
         }
+        runnable.push(file)
+      }
+      if (runnable.length === 1) {
+        const file = runnable[0]
         logStep('[detect] start', {
           fileId: file.id,
           serverId: file.serverId,
@@ -42,14 +56,32 @@ export const useDetection = (fileItemsRef, activeFileId, setFileBoxes, setBoxes,
         const data = await runDetection(file.serverId, maxBoxes, detectionThreshold)
         const detected = sortAndReindexBoxes((data.boxes || []).slice(0, maxBoxes))
         logStep('[detect] boxes', { count: detected.length, first: detected[0], meta: data.meta })
-        setFileBoxes((prev) => ({ ...prev, [file.id]: detected }))
-        if (file.id === activeFileId) {
-          setBoxes(detected)
-          // Do not auto-select boxes created by the detector
-          setSelectedBoxIds([])
-        }
+        applyDetected(file, detected)
         processed++
         setDetectProgress({ current: processed, total: targets.length })
+      } else {
+        for (let start = 0; start < runnable.length; start += DETECT_PAGES_PER_REQUEST) {
+          const chunk = runnable.slice(start, start + DETECT_PAGES_PER_REQUEST)
+          logStep('[detect] batch start', {
+            pages: chunk.length,
+            serverIds: chunk.map((f) => f.serverId),
+            maxBoxes,
+            scope: detectOnePage ? 'single' : detectScope,
+          })
+          const results = await runDetectionBatch(chunk.map((f) => f.serverId), maxBoxes, detectionThreshold)
+          const byServerId = Object.fromEntries(results.map((r) => [r.file_id, r]))
+          for (const file of chunk) {
+            const result = byServerId[file.serverId]
+            if (result?.error) {
+              console.warn('[detect] batch page failed', { fileId: file.id, error: result.error })
+            } else if (result) {
+              logStep('[detect] boxes', { fileId: file.id, count: result.boxes.length, meta: result.meta })
+              applyDetected(file, result.boxes)
+            }
+            processed++
+          }
+          setDetectProgress({ current: processed, total: targets.length })
+        }
       }
     } catch (err) {
       console.error('[detect] error', err)
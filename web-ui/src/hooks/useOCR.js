@@ -1,6 +1,6 @@
 // OCR hook
 import { useState } from 'react'
-import { runOCRStream } from '../services/ocr.js'
+import { runOCRStream, runOCRVolumeStream } from '../services/ocr.js'
 import { logStep } from '../utils/api.js'
 
 export const useOCR = (fileItemsRef, activeFileId, boxes, selectedBoxIds, fileBoxes, setOcrByFile, setOcrResults, ocrByFile) => {
@@ -69,6 +69,8 @@ export const useOCR = (fileItemsRef, activeFileId, boxes, selectedBoxIds, fileBo
         await runOCRStream(serverId, payloadBoxes, routingPayload, lang, (data) => {
           if (data.status === 'complete') {
             logStep('[ocr] stream complete', { total: data.total })
+          } else if (data.status === 'partial') {
+            updateOcrForFile(activeFileId, (prev) => ({ ...prev, [data.box_id]: data.text || '' }))
           } else if (data.box_id) {
             processedBoxes++
             setOcrProgress({ current: processedBoxes, total: totalBoxes })
@@ -86,36 +88,27 @@ export const useOCR = (fileItemsRef, activeFileId, boxes, selectedBoxIds, fileBo
       const nonArchiveFiles = currentFiles.filter((f) => !f.isArchive && f.serverId)
       logStep('[ocr-stream] start', { filesCount: nonArchiveFiles.length })
       
-      let totalBoxes = 0
-      for (const file of nonArchiveFiles) {
-        totalBoxes += (fileBoxes[file.id] || []).length
-      }
-      let processedBoxes = 0
+      // One volume job for every page: the backend batches crops across pages.
+      const pages = nonArchiveFiles
+        .filter((file) => (fileBoxes[file.id] || []).length > 0)
+        .map((file) => ({ file_id: file.serverId, boxes: fileBoxes[file.id] }))
+      const fileIdByServerId = Object.fromEntries(nonArchiveFiles.map((file) => [file.serverId, file.id]))
+      const totalBoxes = pages.reduce((sum, page) => sum + page.boxes.length, 0)
       setOcrProgress({ current: 0, total: totalBoxes })
 
       try {
-        for (const file of nonArchiveFiles) {
-          const pageBoxes = fileBoxes[file.id] || []
-          if (!pageBoxes.length) {
-            logStep('[ocr-stream] skip file (no boxes)', { fileId: file.id })
-            continue
-          }
-
-          logStep('[ocr-stream] processing', { fileId: file.id, serverId: file.serverId, boxes: pageBoxes.length })
-          
-          try {
-            await runOCRStream(file.serverId, pageBoxes, routingPayload, lang, (data) => {
-              if (data.status === 'complete') {
-                logStep('[ocr-stream] file complete', { fileId: file.id, total: data.total })
-              } else if (data.box_id) {
-                processedBoxes++
-                setOcrProgress({ current: processedBoxes, total: totalBoxes })
-                updateOcrForFile(file.id, (prev) => ({ ...prev, [data.box_id]: data.text || '' }))
-              }
-            })
-          } catch (fileErr) {
-            console.error('[ocr-stream] file error', file.id, fileErr)
-          }
+        if (pages.length) {
+          await runOCRVolumeStream(pages, routingPayload, lang, (data) => {
+            const fileId = fileIdByServerId[data.file_id]
+            if (data.status === 'complete') {
+              logStep('[ocr-stream] volume complete', { pages: data.pages, total: data.total })
+            } else if (fileId && data.status === 'partial') {
+              updateOcrForFile(fileId, (prev) => ({ ...prev, [data.box_id]: data.text || '' }))
+            } else if (fileId && data.box_id) {
+              setOcrProgress({ current: data.processed, total: data.total, etaMs: data.eta_ms })
+              updateOcrForFile(fileId, (prev) => ({ ...prev, [data.box_id]: data.text || '' }))
+            }
+          })
         }
         logStep('[ocr-stream] all complete')
       } catch (err) {
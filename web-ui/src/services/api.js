@@ -41,3 +41,7 @@ export const cleanupFiles = async (fileIds) => {
   return data
 }
 
+export const getReadiness = async () => {
+  const data = await fetchWithLogs(`${API_BASE}/api/ready`, { method: 'GET' }, '[ready]')
+  return data
+}
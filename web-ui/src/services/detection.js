@@ -13,3 +13,14 @@ export const runDetection = async (fileId, maxBoxes, threshold) => {
   return { ...data, boxes: detected }
 }
 
+export const runDetectionBatch = async (fileIds, maxBoxes, threshold) => {
+  const form = new FormData()
+  form.append('file_ids', JSON.stringify(fileIds))
+  form.append('max_boxes', String(maxBoxes))
+  form.append('threshold', String(threshold))
+  const data = await fetchWithLogs(`${API_BASE}/api/detect/batch`, { method: 'POST', body: form }, '[detect-batch]')
+  return (data.results || []).map((result) => ({
+    ...result,
+    boxes: sortAndReindexBoxes((result.boxes || []).slice(0, maxBoxes)),
+  }))
+}
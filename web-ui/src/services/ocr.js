@@ -12,3 +12,11 @@ export const runOCRStream = async (fileId, boxes, routing, lang, onMessage) => {
   await processSSEStream(`${API_BASE}/api/ocr/stream`, form, onMessage)
 }
 
+export const runOCRVolumeStream = async (pages, routing, lang, onMessage) => {
+  const form = new FormData()
+  form.append('pages', JSON.stringify(pages))
+  form.append('routing', JSON.stringify(routing))
+  form.append('lang', lang)
+
+  await processSSEStream(`${API_BASE}/api/ocr/volume`, form, onMessage)
+}